@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""Measures the cold import time of flask_arrest.
+
+Runs ``python -X importtime -c 'import flask_arrest'`` in fresh interpreters
+and reports the median cumulative import time of ``flask_arrest``, of
+``flask`` (which cannot be avoided) and the modules with the highest self
+time. Requires Python 3.7 or later.
+
+Usage::
+
+    python benchmarks/import_time.py [--runs 10] [--top 15]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+
+def parse_importtime(output):
+    """Parses ``-X importtime`` output into a dict mapping module names to
+    ``(self_us, cumulative_us)``."""
+    timings = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or '[us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def measure(module):
+    env = dict(os.environ)
+    env.pop('PYTHONIMPORTTIME', None)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))] +
+        env.get('PYTHONPATH', '').split(os.pathsep)
+    )
+    proc = subprocess.Popen(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+        stderr=subprocess.PIPE, env=env, universal_newlines=True,
+    )
+    _, err = proc.communicate()
+    if proc.returncode:
+        raise RuntimeError(err)
+    return parse_importtime(err)
+
+
+def median(values):
+    values = sorted(values)
+    mid = len(values) // 2
+    if len(values) % 2:
+        return values[mid]
+    return (values[mid - 1] + values[mid]) / 2.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--module', default='flask_arrest')
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+
+    def cumulative(name):
+        return median([r.get(name, (0, 0))[1] for r in runs])
+
+    print('%-40s %10.1f ms' % (args.module, cumulative(args.module) / 1e3))
+    print('%-40s %10.1f ms' % ('  of which flask', cumulative('flask') / 1e3))
+    print('%-40s %10.1f ms' % (
+        '  own modules and extra dependencies',
+        (cumulative(args.module) - cumulative('flask')) / 1e3
+    ))
+    print('')
+
+    modules = set()
+    for r in runs:
+        modules.update(r)
+    self_times = sorted(
+        ((median([r.get(m, (0, 0))[0] for r in runs]), m) for m in modules),
+        reverse=True,
+    )
+
+    print('Top %d modules by self time:' % args.top)
+    for self_us, name in self_times[:args.top]:
+        print('  %-38s %10.2f ms' % (name, self_us / 1e3))
+
+    loaded = set(runs[0])
+    for name in ('jsonext', 'arrow', 'dateutil'):
+        print('%-40s %10s' % (name + ' imported eagerly',
+                              'yes' if name in loaded else 'no'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python
+"""Concurrency scaling harness for flask_arrest.
+
+Starts a sample application built on :class:`~flask_arrest.RestBlueprint` and
+``mount_resource`` under werkzeug's WSGI server, either in this process or
+preforked into several worker processes sharing one listening socket, and
+drives it with a configurable mix of requests and ``Accept`` headers. Each
+server process handles requests using a fixed-size pool of threads.
+Throughput and latency percentiles are reported for every combination of
+worker count, thread count and client concurrency, which makes lock
+contention (e.g. in ``locked_cached_property`` or shared renderer state)
+visible as flattening throughput and growing tail latencies.
+
+Example::
+
+    python benchmarks/loadtest.py --threads 1,4,16 --concurrency 1,4,16
+    python benchmarks/loadtest.py --mode prefork --workers 1,2,4 \\
+        --threads 1,8 --mix show=60,query=10,create=20,error=10 \\
+        --accept application/json=90,text/plain=10
+
+Preforking requires ``os.fork`` (i.e. a POSIX system).
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import signal
+import socket
+import sys
+import threading
+import time
+
+try:
+    from http.client import HTTPConnection
+except ImportError:
+    from httplib import HTTPConnection
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, request  # noqa
+from werkzeug.serving import BaseWSGIServer  # noqa
+
+from flask_arrest import RestBlueprint  # noqa
+from flask_arrest.resources import HandlerMixin  # noqa
+from flask_arrest.serializers import serializers  # noqa
+
+
+@serializers.exports('id', 'name', 'tags')
+class Item(object):
+    __slots__ = ('id', 'name', 'tags')
+
+    def __init__(self, id, name, tags):
+        self.id = id
+        self.name = name
+        self.tags = tags
+
+
+class ItemHandler(HandlerMixin):
+    singular = 'item'
+    plural = 'items'
+
+    def __init__(self, size):
+        self.lock = threading.Lock()
+        self.store = dict(
+            (str(i), Item(str(i), 'item %d' % i, ['a', 'b', 'c']))
+            for i in range(size)
+        )
+
+    def _from_id(self, obj_id):
+        return self.store[obj_id]
+
+    def query(self):
+        return list(self.store.values())[:50]
+
+    def create(self):
+        data = json.loads(request.data.decode('utf8'))
+        with self.lock:
+            obj = Item(str(len(self.store)), data['name'], [])
+            self.store[obj.id] = obj
+        return obj
+
+
+def create_app(size):
+    app = Flask('loadtest')
+    api = RestBlueprint('api', __name__)
+    api.outgoing.add_mimetype('text/plain')
+    api.mount_resource(ItemHandler(size))
+    app.register_blueprint(api)
+    return app
+
+
+def parse_weights(spec):
+    weights = []
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        weights.append((name.strip(), float(weight or 1)))
+    return weights
+
+
+def weighted_choice(rnd, weights):
+    total = sum(w for _, w in weights)
+    r = rnd.uniform(0, total)
+    for name, weight in weights:
+        r -= weight
+        if r <= 0:
+            return name
+    return weights[-1][0]
+
+
+def make_request(kind, size, rnd):
+    if kind == 'show':
+        return 'GET', '/item/%d/' % rnd.randrange(size), None
+    if kind == 'query':
+        return 'GET', '/items/', None
+    if kind == 'create':
+        return 'POST', '/items/', json.dumps({'name': 'new'})
+    if kind == 'error':
+        return 'GET', '/item/missing-%d/' % rnd.randrange(size), None
+    raise ValueError('Unknown request kind: %r' % kind)
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """A WSGI server handling requests using a fixed number of threads.
+    Werkzeug's threaded server starts a thread per request instead, which
+    leaves no thread count to vary."""
+
+    def __init__(self, host, port, app, threads, fd=None):
+        BaseWSGIServer.__init__(self, host, port, app, fd=fd)
+        self.multithread = threads > 1
+        self.requests = queue.Queue(threads * 4)
+
+        for _ in range(threads):
+            t = threading.Thread(target=self.work)
+            t.daemon = True
+            t.start()
+
+    def process_request(self, request, client_address):
+        # blocks the accepting loop once all threads are busy and the queue
+        # is full
+        self.requests.put((request, client_address))
+
+    def work(self):
+        while True:
+            request, client_address = self.requests.get()
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+
+class Server(object):
+    def __init__(self, app, mode, workers, threads):
+        self.app = app
+        self.mode = mode
+        self.workers = workers
+        self.threads = threads
+        self.children = []
+        self.server = None
+
+    def start(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(('127.0.0.1', 0))
+        sock.listen(1024)
+        self.sock = sock
+        self.port = sock.getsockname()[1]
+
+        if self.mode == 'threaded':
+            self.server = self._make_server()
+            t = threading.Thread(target=self.server.serve_forever)
+            t.daemon = True
+            t.start()
+            return
+
+        for _ in range(self.workers):
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    self._make_server().serve_forever()
+                finally:
+                    os._exit(0)
+            self.children.append(pid)
+
+    def _make_server(self):
+        return PooledWSGIServer('127.0.0.1', self.port, self.app,
+                                self.threads, fd=self.sock.fileno())
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+        for pid in self.children:
+            os.kill(pid, signal.SIGTERM)
+            os.waitpid(pid, 0)
+        self.sock.close()
+
+
+def run_load(port, concurrency, duration, mix, accept, size, seed):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.time() + duration
+
+    def client(n):
+        rnd = random.Random(seed + n)
+        local = []
+        while time.time() < deadline:
+            method, url, body = make_request(weighted_choice(rnd, mix),
+                                             size, rnd)
+            headers = {'Accept': weighted_choice(rnd, accept)}
+            if body is not None:
+                headers['Content-Type'] = 'application/json'
+
+            start = time.time()
+            try:
+                conn = HTTPConnection('127.0.0.1', port, timeout=30)
+                conn.request(method, url, body, headers)
+                resp = conn.getresponse()
+                resp.read()
+                conn.close()
+            except Exception:
+                with lock:
+                    errors[0] += 1
+                continue
+            local.append(time.time() - start)
+            if resp.status >= 500:
+                with lock:
+                    errors[0] += 1
+
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,))
+               for i in range(concurrency)]
+    started = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.time() - started
+
+    return latencies, errors[0], elapsed
+
+
+def percentile(values, p):
+    if not values:
+        return float('nan')
+    index = min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))
+    return values[index]
+
+
+def parse_ints(spec):
+    return [int(v) for v in spec.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.split('\n\n')[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('--mode', choices=['threaded', 'prefork'],
+                        default='threaded')
+    parser.add_argument('--workers', default='1',
+                        help='comma-separated worker process counts '
+                             '(prefork mode only)')
+    parser.add_argument('--threads', default='8',
+                        help='comma-separated numbers of server threads per '
+                             'process; 1 serves requests sequentially')
+    parser.add_argument('--concurrency', default='1,4,16',
+                        help='comma-separated numbers of client threads')
+    parser.add_argument('--duration', type=float, default=5.0,
+                        help='seconds per configuration')
+    parser.add_argument('--mix', default='show=70,query=10,create=10,error=10')
+    parser.add_argument('--accept',
+                        default='application/json=90,text/plain=10')
+    parser.add_argument('--size', type=int, default=1000,
+                        help='number of items in the sample store')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    # werkzeug logs every request by default
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    mix = parse_weights(args.mix)
+    accept = parse_weights(args.accept)
+    workers = parse_ints(args.workers) if args.mode == 'prefork' else [1]
+
+    print('%-8s %-8s %-8s %-8s %10s %10s %10s %10s %8s' % (
+        'mode', 'workers', 'threads', 'clients', 'req/s', 'p50 ms', 'p99 ms',
+        'p999 ms', 'errors'))
+
+    for worker_count in workers:
+        for thread_count in parse_ints(args.threads):
+            server = Server(create_app(args.size), args.mode, worker_count,
+                            thread_count)
+            server.start()
+            try:
+                for concurrency in parse_ints(args.concurrency):
+                    latencies, errors, elapsed = run_load(
+                        server.port, concurrency, args.duration, mix, accept,
+                        args.size, args.seed,
+                    )
+                    latencies.sort()
+                    print('%-8s %-8d %-8d %-8d %10.1f %10.2f %10.2f %10.2f '
+                          '%8d' % (
+                              args.mode, worker_count, thread_count,
+                              concurrency, len(latencies) / elapsed,
+                              percentile(latencies, 50) * 1e3,
+                              percentile(latencies, 99) * 1e3,
+                              percentile(latencies, 99.9) * 1e3,
+                              errors,
+                          ))
+                    sys.stdout.flush()
+            finally:
+                server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,38 @@
 #!/usr/bin/env python
 
-from flask import Blueprint, request, abort, make_response
+import math
+import random
+
+from flask import (Blueprint, request, abort, make_response, current_app,
+                   url_for, _request_ctx_stack)
 from flask.helpers import locked_cached_property
 from jinja2 import PackageLoader, ChoiceLoader, Environment
 import werkzeug
 
-from .helpers import get_best_mimetype, MIMEMap, register_converter
+from .helpers import (get_best_mimetype, get_endpoint_name, MIMEMap,
+                      CachePolicyMap, register_converter)
 from .resources import ResourceView
+from .coalescing import SingleFlight
+from .loading import Reference
+from .admission import AdmissionControl
+from .cache import InProcessCache
+from . import profiling
 from . import renderers
+from . import parsers
+from .serializers import serializers
 
 __version__ = '0.4.5.dev1'
 
 
+def _prepend_hook(blueprint, attr, f):
+    # registers f ahead of all hooks registered on the blueprint before, e.g.
+    # to run a before_request function ahead of the content-type checks.
+    # attr is the name of the dictionary of hooks on the app
+    def register(state):
+        getattr(state.app, attr).setdefault(blueprint.name, []).insert(0, f)
+    blueprint.record_once(register)
+
+
 class ContentNegotiationMixin(object):
     """A blueprint mixin that supports content negotiation. Used in conjunction
     with the :func:`get_best_mimetype()` and :func:`serialize_response()`
@@ -21,18 +42,24 @@ class ContentNegotiationMixin(object):
     whenever a client sends a request with content to this blueprint. If the
     supplied ``Content-type``-Header is not among the MIME-Types valid for
     the specific endpoint, the request is rejected with a
-    :py:class:`~werkzeug.exceptions.UnsupportedMediaType` exception.
+    :py:class:`~werkzeug.exceptions.UnsupportedMediaType` exception. An
+    endpoint accepting ``*/*`` accepts content of any type.
 
     :attr:`~flask_arrest.ContentNegotiationMixin.outgoing` types supply
     information about which possible mimetypes can be sent back to the client.
     Renderers for data can use these to find an intersection with the
     ``Accept``-headers the client sent. Many will send an HTTP 406 (Not
     Acceptable) error if none of the advertised types is found in the clients
-    ``Accept``-header."""
+    ``Accept``-header.
+
+    Whenever more than one outgoing type is available for an endpoint, its
+    responses will carry a ``Vary: Accept`` header, allowing shared caches to
+    store them safely."""
 
     def __init__(self, *args, **kwargs):
         super(ContentNegotiationMixin, self).__init__(*args, **kwargs)
         self.before_request(self.__check_incoming_content_type)
+        self.after_request(self.__add_vary_header)
 
         self.incoming = MIMEMap()
         """a :py:class:`~flask_arrest.helpers.MIMEMap` of incoming data types.
@@ -53,16 +80,45 @@ class ContentNegotiationMixin(object):
         if not request.content_type and not (request.data or request.form):
             return  # no content, no problem
 
-        # strip the blueprint prefix
-        prefix = self.name + '.'
-        if request.endpoint.startswith(prefix):
-            endpoint_name = request.endpoint[len(prefix):]
-        else:
-            endpoint_name = request.endpoint
-        accepted = self.incoming.get_mimetypes(endpoint_name)
-        if not request.content_type in accepted:
+        accepted = self.incoming.resolve(get_endpoint_name())
+        if not request.content_type in accepted and '*/*' not in accepted:
             abort(415)
 
+    def __add_vary_header(self, response):
+        if len(self.outgoing.resolve(get_endpoint_name())) > 1:
+            response.vary.add('Accept')
+        return response
+
+
+class CacheControlMixin(object):
+    """A blueprint mixin that adds ``Cache-Control`` headers to successful
+    responses to ``GET`` and ``HEAD`` requests.
+
+    Policies are declared per endpoint through
+    :attr:`~flask_arrest.CacheControlMixin.cache_control`. Responses that
+    already carry a ``Cache-Control`` header are left alone."""
+
+    def __init__(self, *args, **kwargs):
+        super(CacheControlMixin, self).__init__(*args, **kwargs)
+        self.after_request(self.__add_cache_control)
+
+        self.cache_control = CachePolicyMap()
+        """a :py:class:`~flask_arrest.helpers.CachePolicyMap` of
+        ``Cache-Control`` directives. Empty by default, sending no
+        ``Cache-Control`` headers at all."""
+
+    def __add_cache_control(self, response):
+        if (request.method not in ('GET', 'HEAD') or
+                response.status_code >= 400 or
+                'Cache-Control' in response.headers):
+            return response
+
+        directives = self.cache_control.get_policy(get_endpoint_name())
+        if directives:
+            for name, value in directives.items():
+                setattr(response.cache_control, name, value)
+        return response
+
 
 class AbsoluteJinjaEnvMixin(object):
     """Jinja environment helper mixin.
@@ -90,9 +146,286 @@ class AbsoluteJinjaEnvMixin(object):
         return env
 
 
+class OptionsMixin(object):
+    """A blueprint mixin answering ``OPTIONS`` requests (including CORS
+    preflights) from responses precomputed when the blueprint is registered,
+    without entering any view or other hook.
+
+    The responses list the methods of all routes of a path in the ``Allow``
+    header and the incoming types accepted for ``POST`` and ``PATCH`` in
+    ``Accept-Post`` and ``Accept-Patch``. If the ``CORS_ALLOW_ORIGIN``
+    configuration value is set, the following CORS headers are added as well:
+
+    * ``Access-Control-Allow-Origin``: ``CORS_ALLOW_ORIGIN``
+    * ``Access-Control-Allow-Methods``: same as ``Allow``
+    * ``Access-Control-Allow-Headers``: ``CORS_ALLOW_HEADERS``, defaulting to
+      :attr:`~flask_arrest.OptionsMixin.CORS_ALLOW_HEADERS`
+    * ``Access-Control-Max-Age``: ``CORS_MAX_AGE``, defaulting to one day
+
+    All other responses of the blueprint receive the
+    ``Access-Control-Allow-Origin`` header (and ``Vary: Origin``, unless it is
+    ``*``). Paths with a view handling ``OPTIONS`` itself are left to that
+    view.
+
+    Changes to the configuration or the
+    :attr:`~flask_arrest.ContentNegotiationMixin.incoming` types after
+    registration are picked up by
+    :py:meth:`~flask_arrest.RestBlueprint.warmup`."""
+
+    #: Request headers allowed in CORS requests by default.
+    CORS_ALLOW_HEADERS = ('Accept', 'Content-Type', 'Prefer', 'If-Match',
+                          'If-None-Match', 'Range')
+
+    def __init__(self, *args, **kwargs):
+        super(OptionsMixin, self).__init__(*args, **kwargs)
+        self._options_headers = {}
+        _prepend_hook(self, 'before_request_funcs', self.__answer_options)
+        self.after_request(self.__add_cors_headers)
+
+    def register(self, app, *args, **kwargs):
+        super(OptionsMixin, self).register(app, *args, **kwargs)
+        self.precompute_options(app)
+
+    def precompute_options(self, app):
+        """Computes the ``OPTIONS`` responses for all routes of the blueprint
+        on ``app``."""
+        prefix = self.name + '.'
+        paths = {}
+        for rule in app.url_map.iter_rules():
+            if rule.endpoint.startswith(prefix):
+                paths.setdefault(rule.rule, []).append(rule)
+
+        config = app.config
+        origin = config.get('CORS_ALLOW_ORIGIN')
+
+        self._options_headers.clear()
+        for path, rules in paths.items():
+            if not all(getattr(rule, 'provide_automatic_options', True)
+                       for rule in rules):
+                # a view answers OPTIONS itself
+                continue
+
+            methods = set()
+            accept = {}
+            for rule in rules:
+                methods.update(rule.methods or ())
+                for method in ('POST', 'PATCH'):
+                    if method in (rule.methods or ()):
+                        accept.setdefault(method, set()).update(
+                            self.incoming.resolve(rule.endpoint[len(prefix):])
+                        )
+
+            allow = ', '.join(sorted(methods))
+            headers = [('Allow', allow)]
+            for method, types in sorted(accept.items()):
+                headers.append(('Accept-' + method.capitalize(),
+                                ', '.join(sorted(types))))
+
+            if origin:
+                headers.extend([
+                    ('Access-Control-Allow-Origin', origin),
+                    ('Access-Control-Allow-Methods', allow),
+                    ('Access-Control-Allow-Headers', ', '.join(
+                        config.get('CORS_ALLOW_HEADERS',
+                                   self.CORS_ALLOW_HEADERS))),
+                    ('Access-Control-Max-Age',
+                     str(config.get('CORS_MAX_AGE', 86400))),
+                ])
+            self._options_headers[path] = headers
+
+    def __answer_options(self):
+        if request.method != 'OPTIONS' or request.url_rule is None:
+            return
+
+        headers = self._options_headers.get(request.url_rule.rule)
+        if headers is not None:
+            return current_app.response_class(status=200, headers=headers)
+
+    def __add_cors_headers(self, response):
+        origin = current_app.config.get('CORS_ALLOW_ORIGIN')
+        if origin:
+            if 'Access-Control-Allow-Origin' not in response.headers:
+                response.headers['Access-Control-Allow-Origin'] = origin
+            if origin != '*':
+                response.vary.add('Origin')
+        return response
+
+
+class AdmissionControlMixin(object):
+    """A blueprint mixin that sheds load by limiting the number of requests
+    processed concurrently per endpoint.
+
+    Limits are declared through
+    :attr:`~flask_arrest.AdmissionControlMixin.admission`. Requests exceeding
+    a limit are rejected with a
+    :py:class:`~flask_arrest.admission.Overloaded` exception (``503 Service
+    Unavailable`` with a ``Retry-After`` header) before any other hook of the
+    blueprint runs, i.e. before the request body is read. Streamed responses
+    hold their slot until the body has been sent."""
+
+    def __init__(self, *args, **kwargs):
+        super(AdmissionControlMixin, self).__init__(*args, **kwargs)
+        _prepend_hook(self, 'before_request_funcs', self.__admit)
+        # runs after all other after_request hooks of the blueprint, which
+        # might replace the response
+        _prepend_hook(self, 'after_request_funcs', self.__defer_release)
+        self.teardown_request(self.__release)
+
+        self.admission = AdmissionControl()
+        """an :py:class:`~flask_arrest.admission.AdmissionControl` holding
+        the limits per endpoint. No limits are set by default."""
+
+    def __admit(self):
+        release = self.admission.admit(get_endpoint_name())
+        if release is not None:
+            _request_ctx_stack.top.arrest_release = release
+
+    def __defer_release(self, response):
+        # streamed bodies are generated after the request has been torn down,
+        # release the slot once the server closes the response instead
+        ctx = _request_ctx_stack.top
+        release = getattr(ctx, 'arrest_release', None)
+        if release is not None and response.is_streamed:
+            response.call_on_close(release)
+            ctx.arrest_release = None
+        return response
+
+    def __release(self, exc):
+        release = getattr(_request_ctx_stack.top, 'arrest_release', None)
+        if release is not None:
+            release()
+
+
+class ProfilingMixin(object):
+    """A blueprint mixin that profiles single requests end-to-end on demand,
+    including the content-type checks, negotiation, view and rendering.
+
+    Profiling is configured through the application config:
+
+    ``PROFILE_SECRET``
+        If set, requests that carry a
+        :py:data:`~flask_arrest.profiling.PROFILE_HEADER` computed by
+        :py:func:`~flask_arrest.profiling.profile_token` are profiled.
+    ``PROFILE_TOKEN_MAX_AGE``
+        Seconds a token stays valid. Defaults to ``300``.
+    ``PROFILE_SAMPLE_RATE``
+        A fraction of requests to profile at random. Defaults to ``0``.
+        Sampled requests are only profiled if ``PROFILE_DIR`` is set, their
+        responses are never altered.
+    ``PROFILE_DIR``
+        If set, profiles are saved as :py:mod:`pstats`-files in this
+        directory. For requests carrying a token, the file name is sent in an
+        ``X-Profile-File`` header. Otherwise, the response body of requests
+        carrying a token is replaced with a text report.
+    ``PROFILE_LIMIT``
+        Number of functions listed in text reports. Defaults to ``50``.
+
+    Profiles are tagged with the endpoint and, for mounted resources, the
+    target resolved by :py:class:`~flask_arrest.resources.ResourceView`.
+    Streamed responses are profiled until they are closed; for inline
+    reports, their body is generated before the report."""
+
+    def __init__(self, *args, **kwargs):
+        super(ProfilingMixin, self).__init__(*args, **kwargs)
+
+        # the profile should cover all other hooks of the blueprint
+        _prepend_hook(self, 'before_request_funcs', self.__start_profiling)
+        _prepend_hook(self, 'after_request_funcs', self.__finish_profiling)
+        self.teardown_request(self.__stop_profiling)
+
+    def __start_profiling(self):
+        config = current_app.config
+        secret = config.get('PROFILE_SECRET')
+        rate = config.get('PROFILE_SAMPLE_RATE', 0)
+
+        requested = bool(secret) and profiling.has_valid_token(
+            secret, config.get('PROFILE_TOKEN_MAX_AGE',
+                               profiling.TOKEN_MAX_AGE)
+        )
+        # sampled profiles can only be saved, never sent to the client
+        if not (requested or (rate and config.get('PROFILE_DIR') and
+                              random.random() < rate)):
+            return
+
+        import cProfile
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # another profiler is active already
+            return
+        _request_ctx_stack.top.arrest_profile = profile
+        _request_ctx_stack.top.arrest_profile_requested = requested
+
+    def __finish_profiling(self, response):
+        ctx = _request_ctx_stack.top
+        profile = getattr(ctx, 'arrest_profile', None)
+        if profile is None:
+            return response
+
+        ctx.arrest_profile = None
+
+        config = current_app.config
+        tags = profiling.get_tags()
+        directory = config.get('PROFILE_DIR')
+
+        requested = ctx.arrest_profile_requested
+
+        if directory:
+            name = profiling.stats_file_name(tags)
+
+            def dump():
+                profile.disable()
+                profiling.dump_stats(profile, directory, tags, name)
+
+            if response.is_streamed:
+                # streamed bodies are generated after this hook, keep
+                # profiling until the server closes the response
+                response.call_on_close(dump)
+            else:
+                dump()
+            if requested:
+                response.headers['X-Profile-File'] = name
+            return response
+
+        if requested and response.is_streamed:
+            # the report replaces the body, generate it first
+            response.get_data()
+            response.close()
+        profile.disable()
+
+        if not requested:
+            return response
+
+        return current_app.response_class(
+            profiling.format_stats(profile, tags,
+                                   config.get('PROFILE_LIMIT', 50)),
+            status=response.status_code, mimetype='text/plain',
+        )
+
+    def __stop_profiling(self, exc):
+        # the request failed before reaching the after_request hooks
+        profile = getattr(_request_ctx_stack.top, 'arrest_profile', None)
+        if profile is not None:
+            profile.disable()
+
+
 # FIXME: this may or may not be removed
 class ResourceMountMixin(object):
-    def mount_resource(self, handler):
+    def __init__(self, *args, **kwargs):
+        super(ResourceMountMixin, self).__init__(*args, **kwargs)
+
+        self.resource_handlers = {}
+        """All handlers mounted on this blueprint, by their ``singular``."""
+
+    def mount_resource(self, handler, coalesce=False):
+        """Mounts all targets of ``handler`` on the blueprint.
+
+        If ``coalesce`` is ``True``, concurrent identical ``GET`` requests to
+        the handler share a single handler execution and rendering (see
+        :py:class:`~flask_arrest.coalescing.SingleFlight`). Requests sending
+        credentials are excluded, unless the handler opts in (see
+        :py:meth:`~flask_arrest.resources.ResourceView.coalescing_key`)."""
         # NOTE: we are not using converters to unmarshal right now - exceptions
         #       triggered by loading resources through converters will not
         #       get handled by the blueprint exception handlers. this may
@@ -105,9 +438,14 @@ class ResourceMountMixin(object):
                 return value
 
             def to_url(self, obj):
+                if isinstance(obj, Reference):
+                    return str(obj.id)
                 return handler._obj_to_id(obj)
 
         register_converter(self, handler.singular, Converter)
+        self.resource_handlers[handler.singular] = handler
+
+        flight = SingleFlight() if coalesce else None
 
         # note: we use getattr instead of hasattr to allow classes to override
         #       methods they don't want with None to hide them
@@ -115,14 +453,19 @@ class ResourceMountMixin(object):
             name = ResourceView.construct_endpoint(handler, target, *data)
 
             if getattr(handler, target, None):
+                if target in ResourceView.RAW_TARGETS:
+                    # raw targets accept content of any type
+                    self.incoming.set_mimetypes(['*/*'], name)
+
                 self.add_url_rule(
                     data[1].format(handler),
-                    view_func=ResourceView.as_view(name, handler),
+                    view_func=ResourceView.as_view(name, handler, flight),
                     methods=data[0])
 
 
 class RestBlueprint(AbsoluteJinjaEnvMixin, ContentNegotiationMixin,
-                    ResourceMountMixin, Blueprint):
+                    CacheControlMixin, OptionsMixin, AdmissionControlMixin,
+                    ProfilingMixin, ResourceMountMixin, Blueprint):
     """A REST Blueprint."""
 
     def __init__(self, *args, **kwargs):
@@ -145,6 +488,82 @@ class RestBlueprint(AbsoluteJinjaEnvMixin, ContentNegotiationMixin,
         blueprint. Should  support the
         :py:class:`~flask_arrest.renderers.Renderer` interface."""
 
+        self.content_parser = parsers.content_parser.copy()
+        """The parser used by
+        :py:func:`~flask_arrest.helpers.deserialize_request` to turn request
+        bodies into data. Per default, a copy of
+        :py:attr:`~flask_arrest.parsers.content_parser` is used as the initial
+        value."""
+
+        self.cache = InProcessCache()
+        """The :py:class:`~flask_arrest.cache.Cache` storing response bodies
+        rendered by :py:func:`~flask_arrest.helpers.serialize_response` with a
+        ``cache_key``. Per default, an
+        :py:class:`~flask_arrest.cache.InProcessCache`; replace it with a
+        :py:class:`~flask_arrest.cache.MmapCache` to share the cache between
+        worker processes."""
+
+        self.serializers = serializers
+        """The :py:class:`~flask_arrest.serializers.SerializerRegistry` used
+        by the default content renderers to turn resource objects into
+        data.
+
+        Unlike the renderers, this is not copied: per default, the shared
+        :py:data:`~flask_arrest.serializers.serializers` registry is used, so
+        classes can be registered once at import time."""
+
+    #: Id used for the dry requests sent by
+    #: :py:meth:`~flask_arrest.RestBlueprint.warmup`.
+    WARMUP_ID = '__warmup__'
+
+    def warmup(self, app):
+        """Primes lazily initialized state before serving traffic.
+
+        Should be called after the blueprint has been registered on ``app``
+        and before the worker accepts connections. Resolves the MIME maps of
+        all endpoints, builds :attr:`absolute_jinja_env` and compiles the
+        exception template, loads the dependencies of the content renderers
+        and sends a dry ``GET`` request for a nonexistent object (with an id
+        of :attr:`WARMUP_ID`) to the ``show`` target of each mounted
+        resource, once for every outgoing type. The ``OPTIONS`` responses are
+        recomputed as well."""
+        self.precompute_options(app)
+
+        prefix = self.name + '.'
+        rules = [rule for rule in app.url_map.iter_rules()
+                 if rule.endpoint.startswith(prefix)]
+
+        for endpoint in [None] + [r.endpoint[len(prefix):] for r in rules]:
+            self.incoming.resolve(endpoint)
+            self.outgoing.resolve(endpoint)
+
+        tpl_name = app.config.get('EXCEPTION_TEMPLATE_TEXT_HTML',
+                                  'exception.html')
+        self.absolute_jinja_env.get_or_select_template(tpl_name)
+
+        if rules:
+            with app.test_request_context():
+                # render inside the blueprint, without matching a real url
+                request.url_rule = rules[0]
+                for content_type in self.outgoing.resolve():
+                    if content_type in self.content_renderer.content_funcs:
+                        self.content_renderer.render_response(
+                            {}, content_type).get_data()
+
+        client = app.test_client()
+        for handler in self.resource_handlers.values():
+            if not getattr(handler, 'show', None):
+                continue
+
+            endpoint = ResourceView.construct_endpoint(handler, 'show',
+                                                       *handler.uris['show'])
+            with app.test_request_context():
+                url = url_for(prefix + endpoint,
+                              obj_id=Reference(self.WARMUP_ID))
+
+            for content_type in self.outgoing.resolve(endpoint):
+                client.get(url, headers={'Accept': content_type})
+
     def http_errorhandlers(self, f):
         """Decorator for registering a function as an exception handler
         for all instances of :py:class:`~werkzeug.exceptions.HTTPException`.
@@ -170,8 +589,15 @@ class RestBlueprint(AbsoluteJinjaEnvMixin, ContentNegotiationMixin,
             # we found no acceptable content-type to render the exception
             # return nothing but the code
             code = getattr(exc, 'code', 500)
-            return make_response(
+            response = make_response(
                 '', code, {}
             )
+        else:
+            response = self.exception_renderer.render_response(exc,
+                                                               content_type)
+
+        retry_after = getattr(exc, 'retry_after', None)
+        if retry_after is not None:
+            response.headers['Retry-After'] = str(int(math.ceil(retry_after)))
 
-        return self.exception_renderer.render_response(exc, content_type)
+        return response
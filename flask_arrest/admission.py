@@ -0,0 +1,130 @@
+import threading
+import time
+
+from flask.helpers import _endpoint_from_view_func
+from werkzeug.exceptions import ServiceUnavailable
+
+
+class Overloaded(ServiceUnavailable):
+    """Raised when a request is rejected by admission control. Carries a
+    ``retry_after`` value in seconds, sent to the client in a ``Retry-After``
+    header."""
+    description = ('The server is currently overloaded. Please try again '
+                   'later.')
+
+    def __init__(self, retry_after, description=None):
+        super(Overloaded, self).__init__(description)
+        self.retry_after = retry_after
+
+
+class _Gate(object):
+    # a counting semaphore with a bounded number of waiters and a timeout,
+    # available on python 2 as well
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self.waiting = 0
+        self.cond = threading.Condition(threading.Lock())
+
+    def enter(self, timeout, max_waiting):
+        with self.cond:
+            if self.active < self.limit:
+                self.active += 1
+                return True
+
+            if not timeout or (max_waiting is not None and
+                               self.waiting >= max_waiting):
+                return False
+
+            deadline = time.time() + timeout
+            self.waiting += 1
+            try:
+                while self.active >= self.limit:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return False
+                    self.cond.wait(remaining)
+                self.active += 1
+                return True
+            finally:
+                self.waiting -= 1
+
+    def leave(self):
+        with self.cond:
+            self.active -= 1
+            self.cond.notify()
+
+
+class AdmissionControl(object):
+    """Maps endpoints to concurrency limits and admits or rejects requests
+    accordingly.
+
+    Each endpoint is limited separately. Endpoints without a limit of their
+    own use the settings of
+    :py:const:`~flask_arrest.admission.AdmissionControl.DEFAULT_ENDPOINT`,
+    if any (the limit still applies per endpoint). Like with
+    :py:class:`~flask_arrest.helpers.MIMEMap`, endpoint names should be given
+    without the Blueprint-prefix."""
+
+    #: The default endpoint, whose limit applies to all endpoints that do not
+    #: have one.
+    DEFAULT_ENDPOINT = None
+
+    def __init__(self):
+        self._limits = {}
+        self._gates = {}
+        self._lock = threading.Lock()
+
+    def set_limit(self, endpoint=DEFAULT_ENDPOINT, max_concurrent=None,
+                  queue_timeout=0, max_waiting=None, retry_after=1):
+        """Sets the limit for an endpoint.
+
+        :param max_concurrent: The number of requests allowed to be processed
+                               concurrently. ``None`` removes the limit.
+        :param queue_timeout: Seconds a request may wait for a slot before it
+                              is rejected. ``0`` rejects immediately.
+        :param max_waiting: Maximum number of requests waiting for a slot.
+                            Requests beyond that are rejected immediately.
+        :param retry_after: Seconds sent in the ``Retry-After`` header of
+                            rejections."""
+        with self._lock:
+            self._limits[endpoint] = (max_concurrent, queue_timeout,
+                                      max_waiting, retry_after)
+            # limits of endpoints using the default might have changed
+            self._gates.clear()
+
+    def get_limit(self, endpoint=DEFAULT_ENDPOINT):
+        """Returns the limit tuple in effect for an endpoint, or ``None``."""
+        limit = self._limits.get(endpoint)
+        if limit is None:
+            limit = self._limits.get(self.DEFAULT_ENDPOINT)
+        if limit is None or limit[0] is None:
+            return None
+        return limit
+
+    def limit(self, **kwargs):
+        def _(f):
+            self.set_limit(_endpoint_from_view_func(f), **kwargs)
+            return f
+        return _
+
+    def admit(self, endpoint):
+        """Admits a request to ``endpoint``, possibly waiting for a slot.
+
+        :return: A callable that must be called once the request is finished,
+                 or ``None`` if the endpoint is not limited.
+        :raise: :py:exc:`~flask_arrest.admission.Overloaded` if the request
+                is rejected."""
+        limit = self.get_limit(endpoint)
+        if limit is None:
+            return None
+        max_concurrent, queue_timeout, max_waiting, retry_after = limit
+
+        gate = self._gates.get(endpoint)
+        if gate is None:
+            with self._lock:
+                gate = self._gates.setdefault(endpoint, _Gate(max_concurrent))
+
+        if not gate.enter(queue_timeout, max_waiting):
+            raise Overloaded(retry_after)
+        return gate.leave
@@ -0,0 +1,325 @@
+from collections import OrderedDict
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+
+class Cache(object):
+    """Basic cache interface.
+
+    Keys are strings, values are ``bytes``. Caches are bounded; entries may
+    be evicted at any time, so a cache miss must always be handled."""
+    def get(self, key):
+        """Returns the value stored for ``key`` or ``None``."""
+        raise NotImplementedError
+
+    def set(self, key, value, timeout=None):
+        """Stores ``value`` for ``key``.
+
+        :param timeout: Seconds after which the entry expires. ``None`` keeps
+                        it until it is evicted.
+        :return: ``True`` if the value was stored, ``False`` if it could not
+                 be (e.g. because it is too large)."""
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Removes ``key`` from the cache, if present."""
+        raise NotImplementedError
+
+    def clear(self):
+        """Removes all entries."""
+        raise NotImplementedError
+
+
+class InProcessCache(Cache):
+    """A least-recently-used cache private to the current process.
+
+    :param max_entries: Number of entries kept before the least recently used
+                        ones are evicted."""
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+
+            value, expires = entry
+            if expires and expires < time.time():
+                return None
+
+            # reinsert as the most recently used entry
+            self._entries[key] = entry
+            return value
+
+    def set(self, key, value, timeout=None):
+        expires = time.time() + timeout if timeout else 0
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, expires)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class MmapCache(Cache):
+    """A cache stored in a memory-mapped file, shared by all processes on a
+    host that open the same ``path`` (e.g. the workers of a preforking
+    server). Requires a POSIX system.
+
+    The file is divided into sets of ``ways`` fixed-size slots; a key can only
+    be stored in the set its hash selects. When a set is full, its least
+    recently used entry is evicted. Lookups do not take any locks: each slot
+    carries a sequence number that is odd while the slot is being written
+    and a checksum, torn reads are detected and treated as misses. Writers
+    lock only the set they write to, using :func:`fcntl.lockf` across
+    processes and a lock per stripe of sets between threads.
+
+    All processes must use the same geometry for a file, opening an existing
+    file with different parameters raises a :py:exc:`ValueError`. The file
+    is not deleted when the cache is closed and outlives restarts, keys
+    should account for that.
+
+    :param path: The cache file. Created if it does not exist.
+    :param max_entries: Number of slots, rounded up to a multiple of
+                        ``ways``.
+    :param max_entry_size: Maximum combined size of key and value in bytes.
+                           Larger values are not cached.
+    :param ways: Number of slots per set.
+    :param stripes: Number of thread locks guarding writes."""
+
+    MAGIC = b'ARRESTMC'
+    VERSION = 1
+
+    # magic, version, number of sets, ways, slot size
+    _FILE_HEADER = struct.Struct('<8sIIII')
+    _FILE_HEADER_SIZE = 64
+
+    # the sequence number precedes the slot header. the last-used stamp is
+    # updated by readers without locking and not covered by the checksum
+    _SEQ = struct.Struct('<I')
+    _SLOT_HEADER = struct.Struct('<QdHII')  # hash, expires, klen, vlen, crc
+    _STAMP = struct.Struct('<d')
+    _STAMP_OFFSET = _SEQ.size + _SLOT_HEADER.size
+    _DATA_OFFSET = _STAMP_OFFSET + _STAMP.size
+
+    def __init__(self, path, max_entries=4096, max_entry_size=4096, ways=8,
+                 stripes=64):
+        import fcntl
+        self._fcntl = fcntl
+
+        self.path = path
+        self.ways = ways
+        self.sets = max(1, -(-max_entries // ways))
+        self.slot_size = self._DATA_OFFSET + max_entry_size
+        self.max_entry_size = max_entry_size
+        self.stripes = stripes
+
+        size = self._FILE_HEADER_SIZE + self.sets * ways * self.slot_size
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            # concurrent initialization is serialized using the header
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, 0)
+            try:
+                self._init_file(size)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, 0)
+            self._mm = mmap.mmap(self._fd, size)
+        except Exception:
+            os.close(self._fd)
+            raise
+
+        self._reset_locks()
+
+    def _init_file(self, size):
+        expected = self._FILE_HEADER.pack(self.MAGIC, self.VERSION, self.sets,
+                                          self.ways, self.slot_size)
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        header = os.read(self._fd, len(expected))
+
+        if header == expected and os.fstat(self._fd).st_size == size:
+            return
+
+        if header[:len(self.MAGIC)] == self.MAGIC:
+            raise ValueError('Cache file %r was created with different '
+                             'parameters.' % self.path)
+
+        # new (or unrecognizable) file, zero it out
+        os.ftruncate(self._fd, 0)
+        os.ftruncate(self._fd, size)
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.write(self._fd, expected)
+
+    def _reset_locks(self):
+        # thread locks are not inherited sanely across fork(), recreate them
+        # in every process
+        self._pid = os.getpid()
+        self._locks = [threading.Lock() for _ in range(self.stripes)]
+
+    def close(self):
+        """Unmaps and closes the cache file."""
+        self._mm.close()
+        os.close(self._fd)
+
+    @staticmethod
+    def _hash(key):
+        return struct.unpack('<Q', hashlib.sha1(key).digest()[:8])[0]
+
+    def _slot_offsets(self, set_index):
+        base = self._FILE_HEADER_SIZE + set_index * self.ways * self.slot_size
+        return range(base, base + self.ways * self.slot_size, self.slot_size)
+
+    def _lookup(self, key, h):
+        # returns (offset, value) of the slot holding key or (None, None)
+        mm = self._mm
+        for off in self._slot_offsets(h % self.sets):
+            seq = self._SEQ.unpack_from(mm, off)[0]
+            if seq & 1:
+                continue
+
+            kh, expires, klen, vlen, crc = self._SLOT_HEADER.unpack_from(
+                mm, off + self._SEQ.size
+            )
+            if kh != h or not klen:
+                continue
+
+            start = off + self._DATA_OFFSET
+            data = mm[start:start + klen + vlen]
+            if self._SEQ.unpack_from(mm, off)[0] != seq:
+                continue
+            if zlib.crc32(data) & 0xffffffff != crc or data[:klen] != key:
+                continue
+            if expires and expires < time.time():
+                return None, None
+
+            return off, data[klen:]
+        return None, None
+
+    def get(self, key):
+        key = _to_bytes(key)
+        off, value = self._lookup(key, self._hash(key))
+        if off is not None:
+            self._STAMP.pack_into(self._mm, off + self._STAMP_OFFSET,
+                                  time.time())
+        return value
+
+    def _lock_set(self, set_index):
+        if os.getpid() != self._pid:
+            self._reset_locks()
+        return _SetLock(self._locks[set_index % self.stripes], self._fcntl,
+                        self._fd, self._slot_offsets(set_index)[0])
+
+    def _write_slot(self, off, h, expires, key, value):
+        mm = self._mm
+        seq = self._SEQ.unpack_from(mm, off)[0]
+
+        # odd sequence numbers mark the slot as being written
+        self._SEQ.pack_into(mm, off, (seq | 1) & 0xffffffff)
+        data = key + value
+        self._SLOT_HEADER.pack_into(mm, off + self._SEQ.size, h, expires,
+                                    len(key), len(value),
+                                    zlib.crc32(data) & 0xffffffff)
+        self._STAMP.pack_into(mm, off + self._STAMP_OFFSET, time.time())
+        start = off + self._DATA_OFFSET
+        mm[start:start + len(data)] = data
+        self._SEQ.pack_into(mm, off, ((seq | 1) + 1) & 0xffffffff)
+
+    def _clear_slot(self, off):
+        self._write_slot(off, 0, 0, b'', b'')
+
+    def set(self, key, value, timeout=None):
+        key = _to_bytes(key)
+        if not key or len(key) + len(value) > self.max_entry_size \
+                or len(key) > 0xffff:
+            return False
+
+        h = self._hash(key)
+        expires = time.time() + timeout if timeout else 0
+        set_index = h % self.sets
+
+        with self._lock_set(set_index):
+            mm = self._mm
+            victim, victim_stamp = None, None
+
+            for off in self._slot_offsets(set_index):
+                kh, _, klen, _, _ = self._SLOT_HEADER.unpack_from(
+                    mm, off + self._SEQ.size
+                )
+                if not klen:
+                    stamp = -1.0
+                elif kh == h:
+                    # the same key (or a colliding one) is replaced
+                    victim = off
+                    break
+                else:
+                    stamp = self._STAMP.unpack_from(
+                        mm, off + self._STAMP_OFFSET
+                    )[0]
+
+                if victim is None or stamp < victim_stamp:
+                    victim, victim_stamp = off, stamp
+
+            self._write_slot(victim, h, expires, key, value)
+        return True
+
+    def delete(self, key):
+        key = _to_bytes(key)
+        h = self._hash(key)
+
+        with self._lock_set(h % self.sets):
+            off, _ = self._lookup(key, h)
+            if off is not None:
+                self._clear_slot(off)
+
+    def clear(self):
+        for set_index in range(self.sets):
+            with self._lock_set(set_index):
+                for off in self._slot_offsets(set_index):
+                    self._clear_slot(off)
+
+
+class _SetLock(object):
+    __slots__ = ('lock', 'fcntl', 'fd', 'offset')
+
+    def __init__(self, lock, fcntl, fd, offset):
+        self.lock = lock
+        self.fcntl = fcntl
+        self.fd = fd
+        self.offset = offset
+
+    def __enter__(self):
+        self.lock.acquire()
+        try:
+            self.fcntl.lockf(self.fd, self.fcntl.LOCK_EX, 1, self.offset)
+        except Exception:
+            self.lock.release()
+            raise
+
+    def __exit__(self, *exc_info):
+        try:
+            self.fcntl.lockf(self.fd, self.fcntl.LOCK_UN, 1, self.offset)
+        finally:
+            self.lock.release()
+
+
+def _to_bytes(key):
+    if isinstance(key, bytes):
+        return key
+    return key.encode('utf8')
@@ -0,0 +1,53 @@
+import threading
+
+
+class _Call(object):
+    __slots__ = ('event', 'result', 'exc')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.exc = None
+
+
+class SingleFlight(object):
+    """Coalesces concurrent calls sharing the same key.
+
+    While a call for a key is in flight, further calls for the same key do not
+    execute their function, but wait for the first one to finish and share
+    its result (or exception). Once the call has finished, the key is
+    forgotten; nothing is cached beyond the lifetime of a single call."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, *args, **kwargs):
+        """Calls ``func(*args, **kwargs)``, unless a call for ``key`` is
+        already in flight, in which case its outcome is returned instead.
+
+        :return: A tuple of ``(result, shared)``, where ``shared`` is ``True``
+                 if the result came from another caller's execution."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+            if call.exc is not None:
+                raise call.exc
+            return call.result, True
+
+        try:
+            call.result = func(*args, **kwargs)
+        except BaseException as e:
+            call.exc = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+        return call.result, False
@@ -3,7 +3,9 @@ from collections import defaultdict
 from flask import current_app, request
 from flask.helpers import _endpoint_from_view_func
 from werkzeug.local import LocalProxy
-from werkzeug.exceptions import NotAcceptable
+from werkzeug.exceptions import (NotAcceptable, BadRequest,
+                                 UnsupportedMediaType)
+from werkzeug.datastructures import ResponseCacheControl
 
 
 current_blueprint = LocalProxy(
@@ -29,7 +31,7 @@ def register_converter(app_or_blueprint, name, converter):
 
 
 def serialize_response(response_data, content_type=None, status=200,
-                       renderer=None):
+                       renderer=None, cache_key=None, cache_timeout=None):
     """Serializes a response using a specified renderer.
 
     This will serialize ``response_data`` with the specified ``content_type``,
@@ -50,6 +52,12 @@ def serialize_response(response_data, content_type=None, status=200,
     :param renderer: The renderer to use. If ``None``, lookup the current
                      blueprint's
                      :attr:`~flask_arrest.RestBlueprint.content_renderer`.
+    :param cache_key: If given, the rendered body is stored in the
+                      blueprint's :attr:`~flask_arrest.RestBlueprint.cache`
+                      and reused for later calls with the same key,
+                      ``content_type`` and ``status``. The key must identify
+                      ``response_data`` (e.g. a resource id and version).
+    :param cache_timeout: Seconds after which a cached body expires.
     :return: A :class:`~flask.Response` object."""
     content_type = content_type or get_best_mimetype()
 
@@ -57,9 +65,82 @@ def serialize_response(response_data, content_type=None, status=200,
         # no accepted content-type. send flasks default 406, instead of raising
         return NotAcceptable()
 
+    if cache_key is not None:
+        cache = current_blueprint.cache
+        key = 'response:%s:%s:%d:%s' % (current_blueprint.name, content_type,
+                                        status, cache_key)
+        cached = cache.get(key)
+        if cached is not None:
+            header, _, body = cached.partition(b'\n')
+            return current_app.response_class(
+                body, status, {'Content-type': header.decode('utf8')}
+            )
+
     if not renderer:
         renderer = current_blueprint.content_renderer
-    return renderer.render_response(response_data, content_type, status)
+    response = renderer.render_response(response_data, content_type, status)
+
+    if cache_key is not None:
+        header = response.headers.get('Content-type', content_type)
+        cache.set(key, header.encode('utf8') + b'\n' + response.get_data(),
+                  cache_timeout)
+    return response
+
+
+def deserialize_request(parser=None):
+    """Parses the body of the current request according to its
+    ``Content-type``.
+
+    If no parser is supplied, use the blueprint's
+    :attr:`~flask_arrest.RestBlueprint.content_parser`. Raises
+    :py:class:`~werkzeug.exceptions.UnsupportedMediaType` if the parser does
+    not support the content type and
+    :py:class:`~werkzeug.exceptions.BadRequest` if the body is malformed.
+
+    :param parser: The parser to use.
+    :return: The parsed data."""
+    if not parser:
+        parser = current_blueprint.content_parser
+
+    if not parser.can_parse(request.mimetype):
+        raise UnsupportedMediaType()
+
+    try:
+        return parser.parse(request.get_data(), request.mimetype)
+    except ValueError as e:
+        raise BadRequest('Malformed request body: %s' % e)
+
+
+def get_endpoint_name():
+    """Returns the endpoint name of the current request, without the
+    blueprint prefix. This is the name used as a key in
+    :py:class:`~flask_arrest.helpers.MIMEMap` instances."""
+    prefix = (request.blueprint or '') + '.'
+    if request.endpoint.startswith(prefix):
+        return request.endpoint[len(prefix):]
+    return request.endpoint
+
+
+def get_preferences():
+    """Parses the ``Prefer``-headers (see :rfc:`7240`) of the current request.
+
+    Returns a dictionary mapping each preference name (lowercased) to its
+    value. Preferences without a value map to ``True``, parameters are
+    ignored. If a preference is given multiple times, the first one wins."""
+    prefs = {}
+
+    for header in request.headers.getlist('Prefer'):
+        for pref in header.split(','):
+            token = pref.split(';', 1)[0].strip()
+            if not token:
+                continue
+
+            name, sep, value = token.partition('=')
+            name = name.strip().lower()
+            value = value.strip().strip('"') if sep else True
+            prefs.setdefault(name, value)
+
+    return prefs
 
 
 def get_best_mimetype():
@@ -71,7 +152,7 @@ def get_best_mimetype():
     comparing it with the ``Accept``-headers sent by the client.."""
     # find out what the client accepts
     return request.accept_mimetypes.best_match(
-        current_blueprint.outgoing.get_mimetypes(request.endpoint)
+        current_blueprint.outgoing.resolve(get_endpoint_name())
     )
 
 
@@ -97,6 +178,7 @@ class MIMEMap(object):
 
     def __init__(self):
         self._map = defaultdict(lambda: set([None]))
+        self._resolved = {}
 
     def add_mimetype(self, mimetype, endpoint=DEFAULT_ENDPOINT):
         """Adds a mimetype to an endpoint."""
@@ -104,6 +186,7 @@ class MIMEMap(object):
             raise ValueError('Cannot add default mimetype on default.')
 
         self._map[endpoint].add(mimetype)
+        self._resolved.clear()
 
     def set_mimetypes(self, mimetypes, endpoint=DEFAULT_ENDPOINT):
         """Sets all mimetypes for an endpoint.
@@ -117,15 +200,28 @@ class MIMEMap(object):
             raise ValueError('Cannot include default mimetype in default.')
 
         self._map[endpoint] = set(mimetypes)
+        self._resolved.clear()
 
     def get_mimetypes(self, endpoint=DEFAULT_ENDPOINT):
         """Get all mimetypes for an endpoint."""
-        mimetypes = set(self._map[endpoint])
+        return set(self.resolve(endpoint))
+
+    def resolve(self, endpoint=DEFAULT_ENDPOINT):
+        """Like :py:meth:`~flask_arrest.helpers.MIMEMap.get_mimetypes`, but
+        returns a cached :py:class:`frozenset` instead of a new set on every
+        call."""
+        try:
+            return self._resolved[endpoint]
+        except KeyError:
+            pass
+
+        mimetypes = set(self._map.get(endpoint, (None,)))
 
         if None in mimetypes:
             mimetypes.update(self._map[None])
             mimetypes.remove(None)
 
+        mimetypes = self._resolved[endpoint] = frozenset(mimetypes)
         return mimetypes
 
     def add(self, extra_type):
@@ -139,3 +235,47 @@ class MIMEMap(object):
             self.set_mimetypes(only_types, _endpoint_from_view_func(f))
             return f
         return _
+
+
+class CachePolicyMap(object):
+    """Maps an endpoint to a set of ``Cache-Control`` directives.
+
+    Directives are given as keyword arguments named like the attributes of
+    :py:class:`~werkzeug.datastructures.ResponseCacheControl`, e.g.
+    ``max_age=60, public=True``. Endpoints without a policy of their own use
+    the one set for
+    :py:const:`~flask_arrest.helpers.CachePolicyMap.DEFAULT_ENDPOINT`, if any.
+
+    Like with :py:class:`~flask_arrest.helpers.MIMEMap`, endpoint names
+    should be given without the Blueprint-prefix."""
+
+    #: The default endpoint, whose policy applies to all endpoints that do not
+    #: have one.
+    DEFAULT_ENDPOINT = None
+
+    def __init__(self):
+        self._map = {}
+
+    def set_policy(self, endpoint=DEFAULT_ENDPOINT, **directives):
+        """Sets the ``Cache-Control`` directives for an endpoint. Passing no
+        directives at all disables caching headers for the endpoint, even if
+        a default policy is set."""
+        for name in directives:
+            if not isinstance(getattr(ResponseCacheControl, name, None),
+                              property):
+                raise ValueError('Unknown Cache-Control directive: %r' % name)
+
+        self._map[endpoint] = directives
+
+    def get_policy(self, endpoint=DEFAULT_ENDPOINT):
+        """Returns the directives for an endpoint, or ``None`` if neither
+        the endpoint nor the default have a policy."""
+        if endpoint in self._map:
+            return self._map[endpoint]
+        return self._map.get(self.DEFAULT_ENDPOINT)
+
+    def policy(self, **directives):
+        def _(f):
+            self.set_policy(_endpoint_from_view_func(f), **directives)
+            return f
+        return _
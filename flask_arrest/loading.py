@@ -0,0 +1,83 @@
+from flask import _request_ctx_stack
+
+
+class Reference(object):
+    """Wraps a raw id, so it can be passed to ``url_for`` in place of a
+    resource object. The converters created by
+    :py:meth:`~flask_arrest.ResourceMountMixin.mount_resource` pass the id
+    through instead of calling the handler's ``_obj_to_id``."""
+    __slots__ = ('id',)
+
+    def __init__(self, id):
+        self.id = id
+
+
+class BatchLoader(object):
+    """Request-scoped identity map and batching loader for a handler.
+
+    Every distinct id is loaded at most once through the loader. Ids that are
+    not loaded yet are fetched in a single call to the handler's
+    ``_from_ids``, which should return a dictionary mapping ids to objects.
+    Ids missing from that dictionary are considered nonexistent (and will not
+    be looked up again).
+
+    Use :py:func:`~flask_arrest.loading.get_loader` to retrieve the loader for
+    the current request instead of instantiating one directly."""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self._objs = {}
+        self._missing = set()
+
+    def load_many(self, ids):
+        """Loads all ``ids`` with at most one backend call. Returns a list of
+        objects in the same order, with ``None`` for nonexistent ids."""
+        pending = []
+        for obj_id in ids:
+            if (obj_id not in self._objs and obj_id not in self._missing and
+                    obj_id not in pending):
+                pending.append(obj_id)
+
+        if pending:
+            found = self.handler._from_ids(pending)
+            for obj_id in pending:
+                if obj_id in found:
+                    self._objs[obj_id] = found[obj_id]
+                else:
+                    self._missing.add(obj_id)
+
+        return [self._objs.get(obj_id) for obj_id in ids]
+
+    def load(self, obj_id):
+        """Loads a single object. Raises a :py:exc:`KeyError` if it does not
+        exist."""
+        self.load_many([obj_id])
+        try:
+            return self._objs[obj_id]
+        except KeyError:
+            raise KeyError(obj_id)
+
+    def prime(self, obj_id, obj):
+        """Adds an already loaded object to the identity map."""
+        self._missing.discard(obj_id)
+        self._objs[obj_id] = obj
+
+
+def get_loader(handler):
+    """Returns the :py:class:`~flask_arrest.loading.BatchLoader` for
+    ``handler`` in the current request, creating it if necessary.
+
+    Outside of a request, a new loader is returned on every call, i.e.
+    nothing is cached."""
+    ctx = _request_ctx_stack.top
+    if ctx is None:
+        return BatchLoader(handler)
+
+    loaders = getattr(ctx, 'arrest_loaders', None)
+    if loaders is None:
+        loaders = ctx.arrest_loaders = {}
+
+    loader = loaders.get(id(handler))
+    if loader is None:
+        loader = loaders[id(handler)] = BatchLoader(handler)
+    return loader
@@ -0,0 +1,295 @@
+"""MessagePack encoding and decoding.
+
+Uses the `msgpack <https://pypi.org/project/msgpack/>`_ library if it is
+installed and falls back to a pure-Python implementation otherwise. In both
+cases, objects MessagePack has no type for are converted by the
+:mod:`jsonext` encoder mixins, exactly like they are for JSON: timestamps
+become UTC ISO 8601 strings, dates ISO 8601 strings, iterables lists, objects
+with a ``to_dict`` method dictionaries and everything else strings. Objects
+registered with a :py:class:`~flask_arrest.serializers.SerializerRegistry`
+are serialized with their registered serializer first.
+"""
+
+from __future__ import absolute_import
+
+from collections import namedtuple
+import json
+import struct
+
+from .serializers import serializers as default_serializers, RawJSON
+
+try:
+    text_type = unicode
+except NameError:
+    text_type = str
+
+try:
+    integer_types = (int, long)
+except NameError:
+    integer_types = (int,)
+
+
+#: A MessagePack extension type, returned by the pure-Python decoder.
+ExtType = namedtuple('ExtType', 'code data')
+
+
+_converter = None
+
+
+def _get_converter():
+    # the jsonext mixins only implement default(), they are used here
+    # without a JSONEncoder. created (and jsonext imported) on first use
+    global _converter
+
+    if _converter is None:
+        from jsonext.mixins import (JSONDateTimeMixin, JSONIterableMixin,
+                                    JSONToDictMixin, JSONStringifyMixin)
+
+        class Converter(JSONDateTimeMixin, JSONIterableMixin, JSONToDictMixin,
+                        JSONStringifyMixin):
+            pass
+
+        _converter = Converter()
+    return _converter
+
+
+def make_default(serializers=None):
+    """Creates a function converting objects MessagePack cannot represent, to
+    be passed as ``default`` to a packer."""
+    serializers = serializers or default_serializers
+    convert = _get_converter().default
+
+    def default(o):
+        serializer = serializers.get_serializer(type(o))
+        if serializer is not None:
+            return serializer(o)
+        if isinstance(o, RawJSON):
+            # unlike JSON output, the fragment needs to be decoded here
+            return json.loads(o.encoded)
+        return convert(o)
+    return default
+
+
+class Packer(object):
+    """Pure-Python MessagePack encoder."""
+
+    def __init__(self, default=None):
+        self.default = default or make_default()
+
+    def pack(self, obj):
+        buf = []
+        self._pack(obj, buf.append, 0)
+        return b''.join(buf)
+
+    def _pack(self, obj, write, depth):
+        if depth > 512:
+            raise ValueError('Maximum nesting depth exceeded.')
+
+        if obj is None:
+            write(b'\xc0')
+        elif obj is True:
+            write(b'\xc3')
+        elif obj is False:
+            write(b'\xc2')
+        elif isinstance(obj, integer_types):
+            write(self._pack_int(obj))
+        elif isinstance(obj, float):
+            write(b'\xcb' + struct.pack('>d', obj))
+        elif isinstance(obj, text_type):
+            data = obj.encode('utf8')
+            write(self._header(len(data), 0xa0, 31, b'\xd9', b'\xda', b'\xdb'))
+            write(data)
+        elif isinstance(obj, (bytes, bytearray)):
+            write(self._header(len(obj), None, 0, b'\xc4', b'\xc5', b'\xc6'))
+            write(bytes(obj))
+        elif isinstance(obj, (list, tuple)):
+            write(self._header(len(obj), 0x90, 15, None, b'\xdc', b'\xdd'))
+            for item in obj:
+                self._pack(item, write, depth + 1)
+        elif isinstance(obj, dict):
+            write(self._header(len(obj), 0x80, 15, None, b'\xde', b'\xdf'))
+            for key, value in obj.items():
+                self._pack(key, write, depth + 1)
+                self._pack(value, write, depth + 1)
+        else:
+            self._pack(self.default(obj), write, depth + 1)
+
+    @staticmethod
+    def _pack_int(n):
+        if 0 <= n < 0x80:
+            return struct.pack('B', n)
+        if -0x20 <= n < 0:
+            return struct.pack('b', n)
+        if n > 0:
+            for code, fmt, limit in ((b'\xcc', '>B', 0xff),
+                                     (b'\xcd', '>H', 0xffff),
+                                     (b'\xce', '>I', 0xffffffff),
+                                     (b'\xcf', '>Q', 0xffffffffffffffff)):
+                if n <= limit:
+                    return code + struct.pack(fmt, n)
+        else:
+            for code, fmt, limit in ((b'\xd0', '>b', 0x80),
+                                     (b'\xd1', '>h', 0x8000),
+                                     (b'\xd2', '>i', 0x80000000),
+                                     (b'\xd3', '>q', 0x8000000000000000)):
+                if -n <= limit:
+                    return code + struct.pack(fmt, n)
+        raise OverflowError('Integer out of range for MessagePack.')
+
+    @staticmethod
+    def _header(n, fix, fix_max, code8, code16, code32):
+        if fix is not None and n <= fix_max:
+            return struct.pack('B', fix | n)
+        if code8 is not None and n <= 0xff:
+            return code8 + struct.pack('>B', n)
+        if n <= 0xffff:
+            return code16 + struct.pack('>H', n)
+        if n <= 0xffffffff:
+            return code32 + struct.pack('>I', n)
+        raise ValueError('Object too large for MessagePack.')
+
+
+class Unpacker(object):
+    """Pure-Python MessagePack decoder. Strings are decoded as utf-8,
+    extension types are returned as :py:class:`ExtType` instances."""
+
+    _FIXED = {
+        0xca: ('>f', 4), 0xcb: ('>d', 8),
+        0xcc: ('>B', 1), 0xcd: ('>H', 2), 0xce: ('>I', 4), 0xcf: ('>Q', 8),
+        0xd0: ('>b', 1), 0xd1: ('>h', 2), 0xd2: ('>i', 4), 0xd3: ('>q', 8),
+    }
+    _LENGTHS = {1: '>B', 2: '>H', 4: '>I'}
+
+    def unpack(self, data):
+        self.data = bytes(data)
+        self.pos = 0
+        obj = self._unpack(0)
+        if self.pos != len(self.data):
+            raise ValueError('Extra data after MessagePack object.')
+        return obj
+
+    def _read(self, n):
+        end = self.pos + n
+        if end > len(self.data):
+            raise ValueError('Unexpected end of MessagePack data.')
+        chunk = self.data[self.pos:end]
+        self.pos = end
+        return chunk
+
+    def _read_fmt(self, fmt, size):
+        return struct.unpack(fmt, self._read(size))[0]
+
+    def _unpack(self, depth):
+        if depth > 512:
+            raise ValueError('Maximum nesting depth exceeded.')
+
+        b = struct.unpack('B', self._read(1))[0]
+
+        if b <= 0x7f:
+            return b
+        if b >= 0xe0:
+            return b - 0x100
+        if 0xa0 <= b <= 0xbf:
+            return self._read(b & 0x1f).decode('utf8')
+        if 0x90 <= b <= 0x9f:
+            return self._array(b & 0x0f, depth)
+        if 0x80 <= b <= 0x8f:
+            return self._map(b & 0x0f, depth)
+        if b == 0xc0:
+            return None
+        if b == 0xc2:
+            return False
+        if b == 0xc3:
+            return True
+        if b in self._FIXED:
+            return self._read_fmt(*self._FIXED[b])
+        if b in (0xd9, 0xda, 0xdb):
+            return self._read(self._length(b - 0xd9)).decode('utf8')
+        if b in (0xc4, 0xc5, 0xc6):
+            return self._read(self._length(b - 0xc4))
+        if b in (0xdc, 0xdd):
+            return self._array(self._length(b - 0xdb), depth)
+        if b in (0xde, 0xdf):
+            return self._map(self._length(b - 0xdd), depth)
+        if 0xd4 <= b <= 0xd8:
+            size = 1 << (b - 0xd4)
+            code = self._read_fmt('>b', 1)
+            return ExtType(code, self._read(size))
+        if b in (0xc7, 0xc8, 0xc9):
+            size = self._length(b - 0xc7)
+            code = self._read_fmt('>b', 1)
+            return ExtType(code, self._read(size))
+        raise ValueError('Invalid MessagePack type byte: 0x%02x' % b)
+
+    def _length(self, index):
+        # index 0, 1, 2 selects an 8, 16 or 32 bit length
+        size = 1 << index
+        return self._read_fmt(self._LENGTHS[size], size)
+
+    def _array(self, n, depth):
+        return [self._unpack(depth + 1) for _ in range(n)]
+
+    def _map(self, n, depth):
+        result = {}
+        for _ in range(n):
+            key = self._unpack(depth + 1)
+            if isinstance(key, list):
+                key = tuple(key)
+            value = self._unpack(depth + 1)
+            try:
+                result[key] = value
+            except TypeError:
+                raise ValueError('Unhashable MessagePack map key: %r' % (key,))
+        return result
+
+
+_library = False
+
+
+def _get_library():
+    # the library is looked up once, on first use: importing it eagerly would
+    # slow down importing flask_arrest, retrying a failed import on every
+    # call would slow down the fallback
+    global _library
+
+    if _library is False:
+        try:
+            import msgpack
+        except ImportError:
+            msgpack = None
+        _library = msgpack
+    return _library
+
+
+def dumps(obj, serializers=None, use_library=True):
+    """Encodes ``obj`` as MessagePack.
+
+    :param serializers: The
+                        :py:class:`~flask_arrest.serializers.SerializerRegistry`
+                        to use. Defaults to the shared registry.
+    :param use_library: If ``False``, always use the pure-Python encoder."""
+    default = make_default(serializers)
+    lib = _get_library() if use_library else None
+
+    if lib is not None:
+        return lib.packb(obj, default=default, use_bin_type=True)
+    return Packer(default).pack(obj)
+
+
+def loads(data, use_library=True):
+    """Decodes MessagePack ``data``. Raises a :py:exc:`ValueError` if it is
+    invalid.
+
+    :param use_library: If ``False``, always use the pure-Python decoder."""
+    lib = _get_library() if use_library else None
+
+    if lib is None:
+        return Unpacker().unpack(data)
+
+    try:
+        return lib.unpackb(data, raw=False)
+    except ValueError:
+        raise
+    except Exception as e:
+        # the library raises its own exception types for malformed data
+        raise ValueError(str(e))
@@ -0,0 +1,60 @@
+from __future__ import absolute_import
+
+import json
+
+from . import msgpackext
+
+
+class PluggableParser(object):
+    """Parses request bodies by registering parsing functions for each
+    content type, the counterpart of
+    :py:class:`~flask_arrest.renderers.PluggableRenderer`.
+
+    Any parser will be called with arguments matching ``data, content_type``,
+    where ``data`` is the raw request body as ``bytes`` and ``content_type``
+    the mimetype of the request. It should raise a :py:exc:`ValueError` if
+    the body is malformed."""
+    def __init__(self):
+        self.content_funcs = {}
+
+    def register_parser(self, content_type, func):
+        """Set parser for ``content_type`` to func."""
+        self.content_funcs[content_type] = func
+
+    def parses(self, content_type):
+        """A function decorator. Decorating a function with this is equivalent
+        to calling ``register_parser(content_type, this_function)``.
+        """
+        def _(f):
+            self.register_parser(content_type, f)
+            return f
+        return _
+
+    def can_parse(self, content_type):
+        return content_type in self.content_funcs
+
+    def parse(self, data, content_type):
+        if not content_type in self.content_funcs:
+            raise KeyError('Content-type %r not registered for %r' % (
+                content_type, self
+            ))
+
+        return self.content_funcs[content_type](data, content_type)
+
+    def copy(self):
+        c = self.__class__()
+        c.content_funcs.update(self.content_funcs)
+        return c
+
+
+content_parser = PluggableParser()
+
+
+@content_parser.parses('application/json')
+def parse_json(data, content_type):
+    return json.loads(data.decode('utf8'))
+
+
+@content_parser.parses('application/msgpack')
+def parse_msgpack(data, content_type):
+    return msgpackext.loads(data)
@@ -0,0 +1,138 @@
+import types
+
+from .serializers import RawJSON
+
+
+#: Marker emitted in place of truncated parts of the output.
+TRUNCATED = '...'
+
+_SEQUENCES = {
+    list: ('[', ']'),
+    tuple: ('(', ')'),
+    set: ('{', '}'),
+    frozenset: ('{', '}'),
+    types.GeneratorType: ('[', ']'),
+}
+
+
+class PrettyPrinter(object):
+    """A streaming pretty-printer.
+
+    Unlike :func:`pprint.pformat`, output is generated while walking the data,
+    in chunks of roughly ``chunk_size`` bytes, and never requires more than a
+    single pass. Containers are printed one item per line.
+
+    :param max_depth: Containers nested deeper than this are replaced by
+                      :data:`~flask_arrest.pretty.TRUNCATED`.
+    :param max_items: Containers with more items than this are truncated.
+    :param max_bytes: Output is truncated after this many bytes.
+    :param serializers: A
+                        :py:class:`~flask_arrest.serializers.SerializerRegistry`
+                        used to turn registered objects into dictionaries.
+    :param encoding: The encoding of the output. Characters that cannot be
+                     encoded are backslash-escaped.
+
+    Any limit set to ``None`` is not enforced."""
+
+    indent = '  '
+
+    def __init__(self, max_depth=None, max_items=None, max_bytes=None,
+                 serializers=None, encoding='ascii', chunk_size=4096):
+        self.max_depth = max_depth
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.serializers = serializers
+        self.encoding = encoding
+        self.chunk_size = chunk_size
+
+    def iter_chunks(self, data):
+        """Generates the pretty-printed representation of ``data`` as encoded
+        chunks."""
+        buf = []
+        buf_len = 0
+        remaining = self.max_bytes
+
+        for piece in self._walk(data, 0):
+            buf.append(piece)
+            buf_len += len(piece)
+            if buf_len < self.chunk_size:
+                continue
+
+            chunk = self._encode(''.join(buf))
+            buf = []
+            buf_len = 0
+
+            if remaining is not None:
+                if len(chunk) > remaining:
+                    yield chunk[:remaining]
+                    yield self._encode('\n' + TRUNCATED + '\n')
+                    return
+                remaining -= len(chunk)
+            yield chunk
+
+        chunk = self._encode(''.join(buf) + '\n')
+        if remaining is not None and len(chunk) > remaining:
+            yield chunk[:remaining]
+            yield self._encode('\n' + TRUNCATED + '\n')
+            return
+        yield chunk
+
+    def _encode(self, text):
+        return text.encode(self.encoding, 'backslashreplace')
+
+    def _walk(self, obj, depth):
+        if self.serializers is not None:
+            obj = self.serializers.serialize(obj)
+
+        if isinstance(obj, RawJSON):
+            yield obj.encoded
+            return
+
+        is_dict = isinstance(obj, dict)
+        if is_dict:
+            opener, closer = '{', '}'
+            items = iter(obj.items())
+        else:
+            brackets = _SEQUENCES.get(type(obj))
+            if brackets is None:
+                for base, brackets in _SEQUENCES.items():
+                    if isinstance(obj, base):
+                        break
+                else:
+                    yield repr(obj)
+                    return
+            opener, closer = brackets
+            items = iter(obj)
+
+        if self.max_depth is not None and depth >= self.max_depth:
+            yield opener + TRUNCATED + closer
+            return
+
+        prefix = '\n' + self.indent * (depth + 1)
+        count = 0
+
+        for item in items:
+            yield (',' if count else opener) + prefix
+
+            if self.max_items is not None and count >= self.max_items:
+                yield TRUNCATED
+                count += 1
+                break
+
+            if is_dict:
+                key, item = item
+                yield repr(key) + ': '
+
+            for piece in self._walk(item, depth + 1):
+                yield piece
+            count += 1
+
+        if count:
+            yield '\n' + self.indent * depth + closer
+        else:
+            yield opener + closer
+
+
+def iter_pformat(data, **kwargs):
+    """Shortcut for ``PrettyPrinter(**kwargs).iter_chunks(data)``."""
+    return PrettyPrinter(**kwargs).iter_chunks(data)
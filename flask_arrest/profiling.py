@@ -0,0 +1,100 @@
+import hashlib
+import hmac
+import os
+import time
+
+from flask import current_app, request
+
+
+#: The request header used to trigger profiling of a single request.
+PROFILE_HEADER = 'X-Profile'
+
+#: Default number of seconds a token is valid, see
+#: :py:func:`~flask_arrest.profiling.has_valid_token`.
+TOKEN_MAX_AGE = 300
+
+
+def profile_token(secret, method, path, timestamp=None):
+    """Computes the value of the :data:`PROFILE_HEADER` required to profile a
+    request to ``path`` using ``method``, for a blueprint configured with
+    ``PROFILE_SECRET = secret``.
+
+    :param timestamp: The time the token is issued at, as seconds since the
+                      epoch. Defaults to now; tokens expire after
+                      ``PROFILE_TOKEN_MAX_AGE`` seconds."""
+    if timestamp is None:
+        timestamp = time.time()
+    return '%d:%s' % (timestamp, _sign(secret, method, path, int(timestamp)))
+
+
+def _sign(secret, method, path, timestamp):
+    if not isinstance(secret, bytes):
+        secret = secret.encode('utf8')
+    msg = ('%d %s %s' % (timestamp, method.upper(), path)).encode('utf8')
+    return hmac.new(secret, msg, hashlib.sha256).hexdigest()
+
+
+def has_valid_token(secret, max_age=TOKEN_MAX_AGE):
+    """Checks whether the current request carries a valid profiling token,
+    issued no more than ``max_age`` seconds ago (or ahead)."""
+    token = request.headers.get(PROFILE_HEADER)
+    if not token:
+        return False
+
+    timestamp, _, signature = str(token).partition(':')
+    try:
+        timestamp = int(timestamp)
+    except ValueError:
+        return False
+    if abs(time.time() - timestamp) > max_age:
+        return False
+
+    expected = _sign(secret, request.method, request.path, timestamp)
+    return hmac.compare_digest(expected, signature)
+
+
+def get_tags():
+    """Returns a dictionary of tags describing the current request: its
+    ``endpoint`` and, for views of mounted resources, the ``target``."""
+    from .resources import ResourceView
+
+    tags = {'endpoint': request.endpoint, 'target': None}
+    view = current_app.view_functions.get(request.endpoint)
+    view_class = getattr(view, 'view_class', None)
+    if view_class is not None and issubclass(view_class, ResourceView):
+        tags['target'] = view_class.extract_endpoint_target(request.endpoint)
+    return tags
+
+
+def stats_file_name(tags):
+    """Returns a unique file name for the stats of a request tagged with
+    ``tags``."""
+    return '%s-%s-%d-%d.pstats' % (
+        tags['endpoint'].replace(os.sep, '_'), tags['target'] or 'view',
+        int(time.time() * 1e6), os.getpid(),
+    )
+
+
+def dump_stats(profile, directory, tags, name=None):
+    """Saves the stats of ``profile`` in ``directory`` as a file loadable by
+    :py:class:`pstats.Stats`. Returns the file name, which defaults to
+    :py:func:`~flask_arrest.profiling.stats_file_name`."""
+    name = name or stats_file_name(tags)
+    profile.dump_stats(os.path.join(directory, name))
+    return name
+
+
+def format_stats(profile, tags, limit):
+    """Formats the stats of ``profile`` as text, sorted by cumulative time."""
+    import pstats
+    try:
+        from StringIO import StringIO
+    except ImportError:
+        from io import StringIO
+
+    buf = StringIO()
+    buf.write('endpoint: %s\ntarget: %s\n\n' % (tags['endpoint'],
+                                                 tags['target']))
+    stats = pstats.Stats(profile, stream=buf)
+    stats.sort_stats('cumulative').print_stats(limit)
+    return buf.getvalue()
@@ -2,16 +2,30 @@ from __future__ import absolute_import
 
 from copy import deepcopy
 import json
-from pprint import pformat
+import re
+import uuid
 
-from flask import make_response, current_app
+from flask import (make_response, current_app, has_request_context,
+                   stream_with_context)
 from .helpers import current_blueprint
-import jsonext
+from .serializers import serializers, RawJSON
+from .pretty import iter_pformat
+from . import msgpackext
+
+# note: jsonext (pulling in arrow and dateutil) is imported when first needed,
+#       keeping the import of flask_arrest cheap for short-lived workers
 
 
 # encoding to be used when sending text/plain
 TEXT_PLAIN_ENCODING = 'utf8'
 
+# default limits of the text/plain content renderer, can be overridden using
+# the TEXT_PLAIN_MAX_DEPTH, TEXT_PLAIN_MAX_ITEMS and TEXT_PLAIN_MAX_BYTES
+# configuration values. a value of None disables a limit
+TEXT_PLAIN_MAX_DEPTH = 32
+TEXT_PLAIN_MAX_ITEMS = 10000
+TEXT_PLAIN_MAX_BYTES = 10 * 1024 * 1024
+
 
 class Renderer(object):
     """Basic Renderer interface.
@@ -68,6 +82,72 @@ class PluggableRenderer(Renderer):
         return deepcopy(self)
 
 
+class JSONSerializerMixin(object):
+    """A mixin for JSONEncoders that consults a
+    :class:`~flask_arrest.serializers.SerializerRegistry` before falling back
+    to the generic type dispatch of the other mixins.
+
+    Instances of :class:`~flask_arrest.serializers.RawJSON` are spliced into
+    the output of :meth:`encode` unchanged."""
+    def __init__(self, *args, **kwargs):
+        self.serializers = kwargs.pop('serializers', serializers)
+        self._raw = None
+        super(JSONSerializerMixin, self).__init__(*args, **kwargs)
+
+    def encode(self, o):
+        if isinstance(o, RawJSON):
+            return o.encoded
+
+        self._raw = None
+        encoded = super(JSONSerializerMixin, self).encode(o)
+        if not self._raw:
+            return encoded
+
+        # raw fragments were encoded as placeholder strings, replace them in
+        # a single pass
+        nonce, fragments = self._raw
+        self._raw = None
+        pattern = re.compile(r'"\\u0000%s:(\d+)\\u0000"' % nonce)
+        return pattern.sub(lambda m: fragments[int(m.group(1))], encoded)
+
+    def default(self, o):
+        if isinstance(o, RawJSON):
+            if self._raw is None:
+                self._raw = (uuid.uuid4().hex, [])
+            nonce, fragments = self._raw
+            fragments.append(o.encoded)
+            return u'\x00%s:%d\x00' % (nonce, len(fragments) - 1)
+
+        serializer = self.serializers.get_serializer(type(o))
+        if serializer is not None:
+            return serializer(o)
+        return super(JSONSerializerMixin, self).default(o)
+
+
+_json_encoder = None
+
+
+def get_json_encoder():
+    """Returns the JSONEncoder class used by the ``application/json``
+    renderer: :class:`jsonext.JSONEncoder` with
+    :class:`~flask_arrest.renderers.JSONSerializerMixin` mixed in. The class
+    is created (and :mod:`jsonext` imported) on first use."""
+    global _json_encoder
+
+    if _json_encoder is None:
+        import jsonext
+
+        class JSONEncoder(JSONSerializerMixin, jsonext.JSONEncoder):
+            pass
+
+        _json_encoder = JSONEncoder
+    return _json_encoder
+
+
+def _get_serializers():
+    return getattr(current_blueprint, 'serializers', serializers)
+
+
 content_renderer = PluggableRenderer()
 exception_renderer = PluggableRenderer()
 
@@ -75,12 +155,36 @@ exception_renderer = PluggableRenderer()
 
 @content_renderer.renders('application/json')
 def render_json_content(data, content_type, status):
-    return jsonext.dumps(data), status, {'Content-type': content_type}
+    return (json.dumps(data, cls=get_json_encoder(),
+                       serializers=_get_serializers()),
+            status, {'Content-type': content_type})
 
 
 @content_renderer.renders('text/plain')
 def render_text_plain_content(data, content_type, status):
-    return pformat(data), status, {'Content-type': 'text/plain; charset=ascii'}
+    # the output is streamed, all limits are enforced while generating it
+    config = current_app.config
+    chunks = iter_pformat(
+        data,
+        max_depth=config.get('TEXT_PLAIN_MAX_DEPTH', TEXT_PLAIN_MAX_DEPTH),
+        max_items=config.get('TEXT_PLAIN_MAX_ITEMS', TEXT_PLAIN_MAX_ITEMS),
+        max_bytes=config.get('TEXT_PLAIN_MAX_BYTES', TEXT_PLAIN_MAX_BYTES),
+        serializers=_get_serializers(),
+    )
+    if has_request_context():
+        # generators in data are walked while streaming, after the request
+        # would otherwise have been torn down
+        chunks = stream_with_context(chunks)
+
+    return current_app.response_class(
+        chunks, status, {'Content-type': 'text/plain; charset=ascii'}
+    )
+
+
+@content_renderer.renders('application/msgpack')
+def render_msgpack_content(data, content_type, status):
+    return (msgpackext.dumps(data, serializers=_get_serializers()),
+            status, {'Content-type': content_type})
 
 
 @exception_renderer.renders('text/plain')
@@ -101,10 +205,8 @@ def text_html(exc, content_type, status):
     return html, exc.code, {'Content-type': 'text/html; charset=utf8'}
 
 
-@exception_renderer.renders('application/problem+json')
-@exception_renderer.renders('application/json')
-def application_problem_json(exc, content_type, status):
-    data = {
+def _problem_details(exc):
+    return {
         'type': ('https://en.wikipedia.org/wiki/List_of_HTTP_status_codes#%d'
                  % exc.code),
         'title': exc.name,
@@ -112,5 +214,19 @@ def application_problem_json(exc, content_type, status):
         'detail': exc.description,
     }
 
+
+@exception_renderer.renders('application/problem+json')
+@exception_renderer.renders('application/json')
+def application_problem_json(exc, content_type, status):
+    data = _problem_details(exc)
+
     return json.dumps(data), exc.code, {'Content-type':
                                         'application/problem+json'}
+
+
+@exception_renderer.renders('application/msgpack')
+def application_problem_msgpack(exc, content_type, status):
+    # same fields as application/problem+json, there is no registered
+    # problem type for msgpack
+    return (msgpackext.dumps(_problem_details(exc)), exc.code,
+            {'Content-type': 'application/msgpack'})
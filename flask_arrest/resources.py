@@ -1,20 +1,341 @@
-from flask import request
+import os
+import shutil
+import tempfile
+
+from flask import request, url_for, current_app
 from flask.views import View
-from werkzeug.exceptions import NotFound
+from werkzeug.exceptions import NotFound, Gone, NotAcceptable
+from werkzeug.http import is_resource_modified
+from werkzeug.routing import BuildError
+from werkzeug.wsgi import wrap_file
 
-from .helpers import serialize_response
+from .helpers import (serialize_response, get_preferences, get_best_mimetype,
+                      current_blueprint)
+from .loading import Reference, get_loader
 
 
 class ResourceView(View):
     VIEW_DELIM = ':'
 
-    def __init__(self, handler):
+    #: Targets that honor ``Prefer: return=minimal`` (see :rfc:`7240`),
+    #: mapped to the status code sent instead of a rendered body.
+    MINIMAL_TARGETS = {
+        'create': 201,
+        'update': 204,
+        'replace': 204,
+    }
+
+    #: Names of handler hooks that describe a representation without
+    #: rendering it. ``_etag`` and ``_last_modified`` supply the validators
+    #: of ``GET`` and ``HEAD`` responses, ``_size`` is used to answer
+    #: ``HEAD`` requests. Each is called with the target and the view
+    #: arguments; ``_size`` additionally receives the content type after the
+    #: target. Hooks return ``None`` for targets they do not support and
+    #: raise a :py:exc:`KeyError` for nonexistent resources.
+    HEAD_HOOKS = ('_etag', '_last_modified', '_size')
+
+    #: Targets returning ready-made response objects, which are passed on
+    #: without involving any renderer.
+    RAW_TARGETS = ('blob',)
+
+    #: Targets whose results have their references expanded (see
+    #: :py:meth:`~flask_arrest.resources.ResourceView.expand_references`),
+    #: mapped to whether they return a collection.
+    EXPANDABLE_TARGETS = {
+        'show': False,
+        'query': True,
+    }
+
+    #: Request headers carrying credentials. Requests sending any of these
+    #: are only coalesced if the handler sets ``coalesce_credentialed``, and
+    #: only with requests sending identical values.
+    CREDENTIAL_HEADERS = ('Authorization', 'Cookie')
+
+    def __init__(self, handler, flight=None):
         self.handler = handler
+        self.flight = flight
 
     def dispatch_request(self, *args, **kwargs):
-        action = getattr(self.handler,
-                         self.extract_endpoint_target(request.endpoint))
-        return serialize_response(action(*args, **kwargs))
+        target = self.extract_endpoint_target(request.endpoint)
+        action = getattr(self.handler, target)
+
+        if target in self.RAW_TARGETS:
+            return action(*args, **kwargs)
+
+        if (target in self.MINIMAL_TARGETS and
+                get_preferences().get('return') == 'minimal'):
+            return self.minimal_response(target, action(*args, **kwargs))
+
+        if (target in self.EXPANDABLE_TARGETS and
+                getattr(self.handler, 'references', None)):
+            action = self.expanding(target, action)
+
+        if request.method == 'HEAD':
+            return self.head_response(target, action, args, kwargs)
+
+        if request.method != 'GET':
+            return serialize_response(action(*args, **kwargs))
+
+        etag, last_modified = self.validators(target, args, kwargs)
+        not_modified = self.not_modified_response(etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        content_type = get_best_mimetype()
+        if not content_type:
+            # the action still runs first, a missing resource is a 404
+            return serialize_response(action(*args, **kwargs))
+
+        if self.flight is not None:
+            response = self.coalesced_response(content_type, action,
+                                               args, kwargs)
+        else:
+            response = serialize_response(action(*args, **kwargs),
+                                          content_type)
+        return self.set_validators(response, etag, last_modified)
+
+    def call_hook(self, name, target, args, kwargs, *hook_args):
+        """Calls the handler hook ``name`` (see
+        :attr:`~flask_arrest.resources.ResourceView.HEAD_HOOKS`), returning
+        ``None`` if the handler does not have it. Raises
+        :py:exc:`~werkzeug.exceptions.NotFound` if the resource does not
+        exist."""
+        hook = getattr(self.handler, name, None)
+        if not hook:
+            return None
+        try:
+            return hook(target, *(hook_args + args), **kwargs)
+        except (ValueError, KeyError):
+            raise NotFound()
+
+    def validators(self, target, args, kwargs):
+        """Returns the ``(etag, last_modified)`` pair reported by the
+        handler's hooks, either of which may be ``None``."""
+        return (self.call_hook('_etag', target, args, kwargs),
+                self.call_hook('_last_modified', target, args, kwargs))
+
+    def set_validators(self, response, etag, last_modified):
+        """Adds the validators that are not ``None`` to ``response``."""
+        if etag is not None:
+            response.set_etag(etag)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        return response
+
+    def not_modified_response(self, etag, last_modified):
+        """Returns a ``304 Not Modified`` response if the request's
+        conditional headers match the validators, otherwise ``None``."""
+        if etag is None and last_modified is None:
+            return None
+        if is_resource_modified(request.environ, etag,
+                                last_modified=last_modified):
+            return None
+
+        response = current_app.response_class(status=304)
+        return self.set_validators(response, etag, last_modified)
+
+    def head_response(self, target, action, args, kwargs):
+        """Answers a ``HEAD`` request without sending a body, with the same
+        status and headers a ``GET`` request would receive.
+
+        If the handler's ``_etag`` or ``_last_modified`` hook (see
+        :attr:`~flask_arrest.resources.ResourceView.HEAD_HOOKS`) describes the
+        target, the headers are built from the hooks without calling
+        ``action``. Otherwise, ``action`` is called and its result rendered,
+        unless the ``_size`` hook supplies the length. Rendered bodies are
+        counted while being discarded."""
+        content_type = get_best_mimetype()
+        if not content_type:
+            return NotAcceptable()
+
+        etag, last_modified = self.validators(target, args, kwargs)
+        not_modified = self.not_modified_response(etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        # only validators establish that the resource exists, a size alone
+        # does not
+        if etag is None and last_modified is None:
+            data = action(*args, **kwargs)
+        size = self.call_hook('_size', target, args, kwargs, content_type)
+
+        if etag is None and last_modified is None and size is None:
+            response = serialize_response(data, content_type)
+            if response.is_streamed:
+                # consume the output without buffering it
+                length = 0
+                for chunk in response.iter_encoded():
+                    length += len(chunk)
+                response.close()
+                response.response = []
+                response.content_length = length
+            return response
+
+        # render nothing to learn the exact Content-Type the renderer sends
+        probe = serialize_response(None, content_type)
+        probe.close()
+
+        response = current_app.response_class(
+            headers={'Content-Type': probe.headers['Content-Type']}
+        )
+
+        # without a size, the length is unknown and must not be sent
+        response.automatically_set_content_length = False
+        if size is not None:
+            response.content_length = size
+        return self.set_validators(response, etag, last_modified)
+
+    def coalescing_key(self, content_type, args, kwargs):
+        """Returns the key identifying requests that may share a result, or
+        ``None`` if the current request must not be coalesced.
+
+        Requests are identical if host URL (which ends up in external links),
+        endpoint, view arguments, query string, negotiated content type and the
+        :attr:`~flask_arrest.resources.ResourceView.CREDENTIAL_HEADERS` match.
+        Requests carrying credentials are never coalesced, unless the handler
+        has a true ``coalesce_credentialed`` attribute."""
+        credentials = tuple(request.headers.get(name)
+                            for name in self.CREDENTIAL_HEADERS)
+        if any(credentials) and not getattr(self.handler,
+                                            'coalesce_credentialed', False):
+            return None
+
+        return (request.host_url, request.endpoint, args,
+                tuple(sorted(kwargs.items())), request.query_string,
+                content_type, credentials)
+
+    def coalesced_response(self, content_type, action, args, kwargs):
+        """Renders the result of ``action``, sharing a single execution of
+        the handler and renderer between all concurrent identical requests
+        (see :py:meth:`~flask_arrest.resources.ResourceView.coalescing_key`).
+        Each caller receives its own response object."""
+        key = self.coalescing_key(content_type, args, kwargs)
+        if key is None:
+            return serialize_response(action(*args, **kwargs), content_type)
+
+        def render():
+            response = serialize_response(action(*args, **kwargs),
+                                          content_type)
+            return (response.get_data(), response.status_code,
+                    list(response.headers))
+
+        (data, status, headers), _ = self.flight.do(key, render)
+        return current_app.response_class(data, status=status,
+                                          headers=headers)
+
+    def expanding(self, target, action):
+        def _(*args, **kwargs):
+            return self.expand_references(target, action(*args, **kwargs))
+        return _
+
+    def expand_references(self, target, result):
+        """Expands the references declared in the handler's ``references``
+        attribute, a dictionary mapping field names to the ``singular`` of the
+        handler mounted for the referenced resource.
+
+        Fields named in the comma-separated ``embed`` query argument are
+        replaced with the referenced objects, loaded in a single batch per
+        referenced handler through its
+        :py:class:`~flask_arrest.loading.BatchLoader`. All other references
+        are replaced with links to the referenced resource.
+
+        A field may hold a single id or a list of ids. Objects are turned into
+        dictionaries using the blueprint's
+        :attr:`~flask_arrest.RestBlueprint.serializers` first; objects that
+        do not turn into dictionaries are left untouched."""
+        blueprint = current_blueprint
+        serializers = getattr(blueprint, 'serializers', None)
+
+        def to_record(obj):
+            if serializers is not None:
+                obj = serializers.serialize(obj)
+            return dict(obj) if isinstance(obj, dict) else None
+
+        many = self.EXPANDABLE_TARGETS[target]
+        objs = list(result) if many else [result]
+        records = [to_record(obj) for obj in objs]
+        embed = set(name.strip()
+                    for name in request.args.get('embed', '').split(','))
+
+        references = sorted(self.handler.references.items())
+
+        # collect the ids of all embedded fields first, so every referenced
+        # handler is asked only once, even if several fields refer to it
+        ids = {}
+        for field, singular in references:
+            if field in embed:
+                field_ids = ids.setdefault(singular, [])
+                for record in records:
+                    if record is not None:
+                        field_ids.extend(self._ref_ids(record.get(field)))
+
+        loaded = {}
+        for singular, ref_ids in ids.items():
+            loader = get_loader(blueprint.resource_handlers[singular])
+            loaded[singular] = dict(zip(ref_ids, loader.load_many(ref_ids)))
+
+        for field, singular in references:
+            ref_handler = blueprint.resource_handlers[singular]
+
+            if field in embed:
+                convert = loaded[singular].get
+            else:
+                endpoint = self.construct_endpoint(ref_handler, 'show',
+                                                   *ref_handler.uris['show'])
+                if request.blueprint:
+                    endpoint = request.blueprint + '.' + endpoint
+
+                def convert(obj_id, endpoint=endpoint):
+                    return url_for(endpoint, obj_id=Reference(obj_id),
+                                   _external=True)
+
+            for record in records:
+                if record is None or record.get(field) is None:
+                    continue
+                value = record[field]
+                if isinstance(value, (list, tuple)):
+                    record[field] = [convert(v) for v in value]
+                else:
+                    record[field] = convert(value)
+
+        expanded = [obj if record is None else record
+                    for obj, record in zip(objs, records)]
+        return expanded if many else expanded[0]
+
+    @staticmethod
+    def _ref_ids(value):
+        if value is None:
+            return []
+        if isinstance(value, (list, tuple)):
+            return value
+        return [value]
+
+    def minimal_response(self, target, obj):
+        """Creates a response without rendering ``obj``.
+
+        The status code is looked up in
+        :attr:`~flask_arrest.resources.ResourceView.MINIMAL_TARGETS`. If
+        ``obj`` is not ``None`` and the handler has a ``show`` target, a
+        ``Location``-header pointing to it is added. It is left out if
+        ``obj`` is a plain ``dict`` (e.g. a status message) rather than a
+        resource object, or if no URL can be built for it."""
+        headers = {'Preference-Applied': 'return=minimal'}
+
+        if (obj is not None and not isinstance(obj, dict) and
+                getattr(self.handler, 'show', None)):
+            endpoint = self.construct_endpoint(self.handler, 'show',
+                                               *self.handler.uris['show'])
+            if request.blueprint:
+                endpoint = request.blueprint + '.' + endpoint
+            try:
+                headers['Location'] = url_for(endpoint, obj_id=obj,
+                                              _external=True)
+            except BuildError:
+                pass
+
+        return current_app.response_class(
+            status=self.MINIMAL_TARGETS[target], headers=headers
+        )
 
     @classmethod
     def construct_endpoint(cls, handler, target,
@@ -41,14 +362,166 @@ class HandlerMixin(object):
         'replace': (['PUT'], '/{0.singular}/<{0.singular}:obj_id>/'),
         'remove': (['DELETE'], '/{0.singular}/<{0.singular}:obj_id>/'),
         'query': (['GET'], '/{0.plural}/'),
+        'changes': (['GET'], '/{0.plural}/changes/'),
+        'blob': (['GET', 'PUT'], '/{0.singular}/<{0.singular}:obj_id>/blob'),
     }
 
+    #: Maps field names to the ``singular`` of the handler of the resource
+    #: they reference. See
+    #: :py:meth:`~flask_arrest.resources.ResourceView.expand_references`.
+    references = {}
+
+    #: Whether requests carrying credentials may be coalesced when the handler
+    #: is mounted with ``coalesce=True``. Only requests with identical
+    #: credentials share a result; set this only if responses do not depend
+    #: on anything else about the caller.
+    coalesce_credentialed = False
+
     def _obj_to_id(self, obj):
         return str(obj.id)
 
+    def _from_ids(self, ids):
+        # handlers that can fetch multiple objects at once should override
+        # this to avoid issuing a lookup per id
+        objs = {}
+        for obj_id in ids:
+            try:
+                objs[obj_id] = self._from_id(obj_id)
+            except (ValueError, KeyError):
+                pass
+        return objs
+
+    @property
+    def loader(self):
+        """The :py:class:`~flask_arrest.loading.BatchLoader` of the current
+        request."""
+        return get_loader(self)
+
     def show(self, obj_id):
         try:
-            obj = self._from_id(obj_id)
+            obj = self.loader.load(obj_id)
         except (ValueError, KeyError):
             raise NotFound()
         return obj
+
+
+class ChangeFeedMixin(object):
+    """Adds a ``changes`` target to a handler, allowing clients to fetch only
+    the resources created, updated or removed since their last sync.
+
+    Handlers implement ``_changes_since(token)``, which is passed the opaque
+    sync token sent by the client in the ``since`` query argument (``None``
+    for an initial sync) and returns an iterable of
+    ``(token, op, obj_id, obj)`` tuples in order. ``token`` is the sync token
+    a client would send to receive all changes after this one, ``op`` one of
+    ``'created'``, ``'updated'`` or ``'removed'`` and ``obj`` the resource
+    (``None`` for removals). If the token is invalid or expired, a
+    :py:exc:`ValueError` should be raised, resulting in ``410 Gone``.
+
+    The iterable is consumed lazily, at most
+    :attr:`~flask_arrest.resources.ChangeFeedMixin.changes_page_size` (or the
+    smaller ``limit`` query argument) changes are returned per request. If
+    there are more, the response includes a link to the next page."""
+
+    #: Maximum number of changes returned per request.
+    changes_page_size = 100
+
+    def changes(self):
+        token = request.args.get('since') or None
+        limit = request.args.get('limit', type=int) or self.changes_page_size
+        limit = max(1, min(limit, self.changes_page_size))
+
+        changes = []
+        next_token = token
+        more = False
+
+        try:
+            for entry_token, op, obj_id, obj in self._changes_since(token):
+                if len(changes) >= limit:
+                    more = True
+                    break
+
+                change = {'op': op, 'id': obj_id}
+                if obj is not None:
+                    change['resource'] = obj
+                changes.append(change)
+                next_token = entry_token
+        except ValueError:
+            raise Gone('The sync token is invalid or has expired.')
+
+        data = {'changes': changes, 'token': next_token, 'more': more}
+        if more:
+            data['next'] = url_for(request.endpoint, since=next_token,
+                                   limit=limit, _external=True)
+        return data
+
+
+class AttachmentMixin(object):
+    """Adds a ``blob`` target to a handler, storing and serving a binary
+    attachment per resource, bypassing the renderers entirely.
+
+    Handlers implement ``_open_blob(obj_id)``, returning a tuple of
+    ``(fileobj, mimetype)`` for the attachment of a resource, and
+    ``_store_blob(obj_id, fileobj, mimetype)``. Both should raise a
+    :py:exc:`KeyError` for nonexistent resources.
+
+    Downloads are sent using the WSGI server's file wrapper (``sendfile``,
+    where available) and support conditional and ``Range`` requests if the
+    size of the file can be determined. Uploads are streamed into a
+    :py:class:`~tempfile.SpooledTemporaryFile`, which is kept in memory only
+    up to the ``BLOB_SPOOL_MAX_SIZE`` configuration value (default 1 MiB)."""
+
+    #: Size of the chunks read from the request stream on uploads.
+    blob_chunk_size = 64 * 1024
+
+    def blob(self, obj_id):
+        if request.method == 'PUT':
+            return self._receive_blob(obj_id)
+        return self._send_blob(obj_id)
+
+    def _send_blob(self, obj_id):
+        try:
+            fileobj, mimetype = self._open_blob(obj_id)
+        except KeyError:
+            raise NotFound()
+
+        response = current_app.response_class(
+            wrap_file(request.environ, fileobj),
+            mimetype=mimetype, direct_passthrough=True,
+        )
+
+        try:
+            stat = os.fstat(fileobj.fileno())
+        except (AttributeError, IOError, OSError, ValueError):
+            # not backed by a file, conditional requests are not supported
+            return response
+
+        response.content_length = stat.st_size
+        response.last_modified = int(stat.st_mtime)
+        response.set_etag('%x-%x' % (int(stat.st_mtime * 1e6), stat.st_size))
+
+        try:
+            return response.make_conditional(request, accept_ranges=True,
+                                             complete_length=stat.st_size)
+        except Exception:
+            # e.g. an unsatisfiable range, the response is never sent
+            response.close()
+            raise
+
+    def _receive_blob(self, obj_id):
+        spool = tempfile.SpooledTemporaryFile(
+            max_size=current_app.config.get('BLOB_SPOOL_MAX_SIZE',
+                                            1024 * 1024)
+        )
+        try:
+            shutil.copyfileobj(request.stream, spool, self.blob_chunk_size)
+            spool.seek(0)
+
+            try:
+                self._store_blob(obj_id, spool, request.mimetype)
+            except KeyError:
+                raise NotFound()
+        finally:
+            spool.close()
+
+        return current_app.response_class(status=204)
@@ -0,0 +1,104 @@
+from operator import attrgetter
+
+
+class RawJSON(object):
+    """Already serialized JSON.
+
+    Handlers can return instances of this class, or embed them anywhere inside
+    the data they return. The ``application/json`` renderer splices
+    :attr:`encoded` into its output verbatim, without ever parsing it, so it
+    is up to the caller to ensure it is valid JSON.
+
+    :param encoded: The JSON text, either as ``bytes`` (utf-8) or text."""
+    __slots__ = ('encoded',)
+
+    def __init__(self, encoded):
+        if isinstance(encoded, bytes):
+            encoded = encoded.decode('utf8')
+        self.encoded = encoded
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.encoded)
+
+
+class SerializerRegistry(object):
+    """Registry of per-class serializers.
+
+    A class declares the fields it exports once, either by calling
+    :meth:`register` or by decorating it with :meth:`exports`. The first time
+    an instance of the class (or one of its subclasses) is serialized, a
+    specialized function turning it into a ``dict`` is built and cached, so
+    hot endpoints do not pay for generic reflection on every object.
+
+    Classes using ``__slots__`` are supported, as fields are read using
+    :func:`operator.attrgetter`."""
+
+    def __init__(self):
+        self._fields = {}
+        self._compiled = {}
+
+    def register(self, cls, fields):
+        """Register ``fields`` as the exported fields of ``cls``.
+
+        :param cls: The class to register.
+        :param fields: An iterable of attribute names. The names are used
+                       as keys in the resulting ``dict`` as well."""
+        self._fields[cls] = tuple(fields)
+
+        # subclasses might have been compiled using a base class' fields
+        self._compiled.clear()
+
+    def exports(self, *fields):
+        """A class decorator. Decorating a class with this is equivalent to
+        calling ``register(this_class, fields)``."""
+        def _(cls):
+            self.register(cls, fields)
+            return cls
+        return _
+
+    def get_serializer(self, cls):
+        """Returns the compiled serializer for ``cls`` or ``None``, if neither
+        ``cls`` nor any of its bases are registered."""
+        try:
+            return self._compiled[cls]
+        except KeyError:
+            pass
+
+        serializer = None
+        for base in getattr(cls, '__mro__', ()):
+            if base in self._fields:
+                serializer = self._compile(self._fields[base])
+                break
+
+        # races are harmless here, the result is always the same
+        self._compiled[cls] = serializer
+        return serializer
+
+    def serialize(self, obj):
+        """Serializes a single object using its registered serializer.
+        Objects of unregistered types are returned unchanged."""
+        serializer = self.get_serializer(type(obj))
+        if serializer is None:
+            return obj
+        return serializer(obj)
+
+    def copy(self):
+        c = self.__class__()
+        c._fields.update(self._fields)
+        return c
+
+    @staticmethod
+    def _compile(fields):
+        if not fields:
+            return lambda obj: {}
+
+        getter = attrgetter(*fields)
+        if len(fields) == 1:
+            name = fields[0]
+            return lambda obj: {name: getter(obj)}
+
+        return lambda obj: dict(zip(fields, getter(obj)))
+
+
+#: The default serializer registry, shared by all blueprints unless replaced.
+serializers = SerializerRegistry()
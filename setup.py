@@ -21,5 +21,6 @@ setup(
     license='MIT',
     packages=find_packages(exclude=['test']),
     install_requires=['Flask', 'werkzeug', 'jsonext'],
+    extras_require={'msgpack': ['msgpack']},
     tests_require=['pytest'],
 )
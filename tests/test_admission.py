@@ -0,0 +1,147 @@
+import json
+import threading
+
+from flask import Flask
+from flask_arrest import RestBlueprint
+from flask_arrest.admission import AdmissionControl, Overloaded
+
+import pytest
+
+
+@pytest.fixture
+def control():
+    control = AdmissionControl()
+    control.set_limit('limited', max_concurrent=1)
+    return control
+
+
+def test_unlimited_by_default():
+    assert AdmissionControl().admit('foo') is None
+
+
+def test_rejects_over_limit(control):
+    release = control.admit('limited')
+
+    with pytest.raises(Overloaded) as e:
+        control.admit('limited')
+    assert e.value.code == 503
+    assert e.value.retry_after == 1
+
+    release()
+    control.admit('limited')()
+
+
+def test_default_limit_applies_per_endpoint():
+    control = AdmissionControl()
+    control.set_limit(max_concurrent=1)
+
+    control.admit('a')
+    control.admit('b')
+    with pytest.raises(Overloaded):
+        control.admit('a')
+
+
+def test_queue_timeout(control):
+    control.set_limit('limited', max_concurrent=1, queue_timeout=5)
+    release = control.admit('limited')
+
+    timer = threading.Timer(0.05, release)
+    timer.start()
+    control.admit('limited')()
+    timer.join()
+
+
+def test_queue_timeout_expires(control):
+    control.set_limit('limited', max_concurrent=1, queue_timeout=0.01)
+    control.admit('limited')
+
+    with pytest.raises(Overloaded):
+        control.admit('limited')
+
+
+def test_max_waiting(control):
+    control.set_limit('limited', max_concurrent=1, queue_timeout=5,
+                      max_waiting=0)
+    control.admit('limited')
+
+    with pytest.raises(Overloaded):
+        control.admit('limited')
+
+
+@pytest.fixture
+def app():
+    app = Flask('admission_testapp')
+    app.testing = True
+    api = RestBlueprint('api', __name__)
+    app.entered = threading.Event()
+    app.release = threading.Event()
+
+    @api.admission.limit(max_concurrent=1, retry_after=2.5)
+    @api.route('/slow/', methods=['GET', 'POST'])
+    def slow():
+        app.entered.set()
+        app.release.wait(5)
+        return 'done'
+
+    @api.admission.limit(max_concurrent=1)
+    @api.route('/stream/')
+    def stream():
+        def generate():
+            app.entered.set()
+            app.release.wait(5)
+            yield 'done'
+        return app.response_class(generate())
+
+    app.register_blueprint(api)
+    return app
+
+
+def test_shed_with_problem_json(app):
+    results = []
+    t = threading.Thread(target=lambda: results.append(
+        app.test_client().get('/slow/')
+    ))
+    t.start()
+    app.entered.wait(5)
+
+    try:
+        resp = app.test_client().post('/slow/', data='unread', headers={
+            'Accept': 'application/problem+json, application/json',
+            'Content-Type': 'application/not-accepted',
+        })
+    finally:
+        app.release.set()
+        t.join()
+
+    # rejected before the content-type check (which would give a 415)
+    assert resp.status_code == 503
+    assert resp.headers['Retry-After'] == '3'
+    assert resp.content_type == 'application/problem+json'
+    assert json.loads(resp.data.decode('utf8'))['status'] == 503
+
+    assert results[0].status_code == 200
+    # the slot has been released again
+    assert app.test_client().get('/slow/').status_code == 200
+
+
+def test_streamed_response_holds_slot(app):
+    results = []
+    t = threading.Thread(target=lambda: results.append(
+        app.test_client().get('/stream/', buffered=True)
+    ))
+    t.start()
+    app.entered.wait(5)
+
+    try:
+        # the first body is still being generated
+        resp = app.test_client().get('/stream/', headers={
+            'Accept': 'application/json'
+        })
+    finally:
+        app.release.set()
+        t.join()
+
+    assert resp.status_code == 503
+    assert results[0].data == b'done'
+    # released once the streamed body was closed
+    assert app.test_client().get('/stream/', buffered=True).status_code == 200
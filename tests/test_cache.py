@@ -0,0 +1,226 @@
+import os
+import threading
+import time
+
+from flask import Flask
+from flask_arrest import RestBlueprint
+from flask_arrest.cache import InProcessCache, MmapCache
+from flask_arrest.helpers import serialize_response
+
+import pytest
+
+
+@pytest.fixture
+def path(tmpdir):
+    return str(tmpdir.join('arrest.cache'))
+
+
+@pytest.fixture(params=['inprocess', 'mmap'])
+def cache(request, path):
+    if request.param == 'inprocess':
+        return InProcessCache(max_entries=16)
+    c = MmapCache(path, max_entries=16, max_entry_size=64, ways=4)
+    request.addfinalizer(c.close)
+    return c
+
+
+def test_get_set_delete(cache):
+    assert cache.get('a') is None
+    assert cache.set('a', b'1')
+    assert cache.get('a') == b'1'
+
+    cache.set('a', b'22')
+    assert cache.get('a') == b'22'
+
+    cache.delete('a')
+    assert cache.get('a') is None
+    cache.delete('a')
+
+
+def test_empty_value(cache):
+    cache.set('a', b'')
+    assert cache.get('a') == b''
+
+
+def test_timeout(cache):
+    cache.set('a', b'1', timeout=0.05)
+    cache.set('b', b'2')
+    time.sleep(0.1)
+
+    assert cache.get('a') is None
+    assert cache.get('b') == b'2'
+
+
+def test_clear(cache):
+    cache.set('a', b'1')
+    cache.set('b', b'2')
+    cache.clear()
+
+    assert cache.get('a') is None
+    assert cache.get('b') is None
+
+
+def test_bounded(cache):
+    for i in range(100):
+        cache.set('key%d' % i, b'x')
+
+    stored = sum(cache.get('key%d' % i) is not None for i in range(100))
+    assert 0 < stored <= 16
+    assert cache.get('key99') == b'x'
+
+
+def test_inprocess_lru():
+    cache = InProcessCache(max_entries=2)
+    cache.set('a', b'1')
+    cache.set('b', b'2')
+    cache.get('a')
+    cache.set('c', b'3')
+
+    assert cache.get('a') == b'1'
+    assert cache.get('b') is None
+
+
+def test_mmap_lru_within_set(path):
+    cache = MmapCache(path, max_entries=2, ways=2)
+    cache.set('a', b'1')
+    cache.set('b', b'2')
+    cache.get('a')
+    cache.set('c', b'3')
+
+    assert cache.get('a') == b'1'
+    assert cache.get('b') is None
+    assert cache.get('c') == b'3'
+
+
+def test_mmap_too_large(path):
+    cache = MmapCache(path, max_entries=8, max_entry_size=16)
+
+    assert not cache.set('a', b'x' * 16)
+    assert cache.get('a') is None
+    assert cache.set('a', b'x' * 15)
+
+
+def test_mmap_persistent(path):
+    MmapCache(path, max_entries=8).set('a', b'1')
+
+    assert MmapCache(path, max_entries=8).get('a') == b'1'
+
+
+def test_mmap_geometry_mismatch(path):
+    MmapCache(path, max_entries=8)
+
+    with pytest.raises(ValueError):
+        MmapCache(path, max_entries=16)
+
+
+def test_mmap_shared_between_instances(path):
+    a = MmapCache(path, max_entries=8)
+    b = MmapCache(path, max_entries=8)
+
+    a.set(u'k\xfc', b'1')
+    assert b.get(u'k\xfc') == b'1'
+    b.delete(u'k\xfc')
+    assert a.get(u'k\xfc') is None
+
+
+def fork(func):
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            func()
+            code = 0
+        finally:
+            os._exit(code)
+    return pid
+
+
+def wait(pid):
+    return os.waitpid(pid, 0)[1] == 0
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires fork()')
+def test_mmap_shared_between_processes(path):
+    cache = MmapCache(path, max_entries=64)
+    cache.set('parent', b'p')
+
+    def child():
+        assert cache.get('parent') == b'p'
+        cache.set('child', b'c')
+
+    assert wait(fork(child))
+    assert cache.get('child') == b'c'
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires fork()')
+def test_mmap_concurrent_writers(path):
+    # values can be verified against their keys, a torn read would show up
+    # as a mismatch
+    cache = MmapCache(path, max_entries=32, max_entry_size=512, ways=4)
+    keys = ['key%d' % i for i in range(64)]
+
+    def value(key, n):
+        return (key * 50)[:n].encode('ascii')
+
+    def writer(seed):
+        for i in range(2000):
+            key = keys[(i * 7 + seed) % len(keys)]
+            cache.set(key, value(key, (i * 13 + seed) % 400))
+
+    errors = []
+
+    def reader():
+        for i in range(4000):
+            key = keys[i % len(keys)]
+            v = cache.get(key)
+            if v is not None and v != value(key, len(v)):
+                errors.append((key, v))
+
+    pids = [fork(lambda seed=seed: writer(seed)) for seed in range(3)]
+    threads = [threading.Thread(target=f) for f in (reader, reader,
+                                                     lambda: writer(3))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert all(wait(pid) for pid in pids)
+    assert not errors
+
+
+@pytest.fixture
+def app():
+    app = Flask('cache_testapp')
+    app.testing = True
+    api = RestBlueprint('api', __name__)
+    api.outgoing.add_mimetype('text/plain')
+    app.renders = 0
+
+    @api.route('/item/')
+    def item():
+        app.renders += 1
+        return serialize_response({'id': 1}, cache_key='item:1')
+
+    app.register_blueprint(api)
+    return app
+
+
+def test_response_cached(app):
+    renderer = app.blueprints['api'].content_renderer
+    render_json = renderer.content_funcs['application/json']
+    calls = []
+
+    def counting(*args):
+        calls.append(args)
+        return render_json(*args)
+    renderer.register_renderer('application/json', counting)
+
+    client = app.test_client()
+    for accept in ['application/json', 'text/plain', 'application/json']:
+        resp = client.get('/item/', headers={'Accept': accept})
+        assert resp.status_code == 200
+        assert resp.content_type.startswith(accept)
+
+    assert resp.data == b'{"id": 1}'
+    assert app.renders == 3
+    assert len(calls) == 1
@@ -0,0 +1,96 @@
+from flask import Flask, abort
+from flask_arrest import RestBlueprint
+from flask_arrest.helpers import CachePolicyMap
+
+import pytest
+
+
+@pytest.fixture
+def app():
+    app = Flask('caching_testapp')
+    app.testing = True
+    return app
+
+
+@pytest.fixture
+def api(app):
+    api = RestBlueprint('api', __name__)
+
+    @api.cache_control.policy(max_age=60, public=True)
+    @api.outgoing.only(['application/json'])
+    @api.route('/single/')
+    def single():
+        return 'single'
+
+    @api.route('/multi/')
+    def multi():
+        return 'multi'
+
+    @api.route('/fail/')
+    def fail():
+        abort(404)
+
+    api.outgoing.add_mimetype('text/plain')
+    app.register_blueprint(api)
+
+    return api
+
+
+@pytest.fixture
+def client(app, api):
+    return app.test_client()
+
+
+def test_no_vary_for_single_type(client):
+    resp = client.get('/single/')
+
+    assert 'Vary' not in resp.headers
+
+
+def test_vary_for_multiple_types(client):
+    resp = client.get('/multi/')
+
+    assert resp.headers['Vary'] == 'Accept'
+
+
+def test_vary_on_errors(client):
+    resp = client.get('/fail/', headers={'Accept': 'application/json'})
+
+    assert resp.status_code == 404
+    assert resp.headers['Vary'] == 'Accept'
+
+
+def test_cache_control_policy(client):
+    cc = client.get('/single/').headers['Cache-Control']
+
+    assert 'max-age=60' in cc
+    assert 'public' in cc
+
+
+def test_no_cache_control_by_default(client):
+    assert 'Cache-Control' not in client.get('/multi/').headers
+
+
+def test_default_policy_not_applied_to_errors(client, api):
+    api.cache_control.set_policy(max_age=10)
+
+    assert 'max-age=10' in client.get('/multi/').headers['Cache-Control']
+    assert 'Cache-Control' not in client.get(
+        '/fail/', headers={'Accept': 'application/json'}
+    ).headers
+
+
+def test_policy_map_defaults():
+    m = CachePolicyMap()
+    assert m.get_policy('foo') is None
+
+    m.set_policy(max_age=5)
+    m.set_policy('bar')
+
+    assert m.get_policy('foo') == {'max_age': 5}
+    assert m.get_policy('bar') == {}
+
+
+def test_unknown_directive():
+    with pytest.raises(ValueError):
+        CachePolicyMap().set_policy(max_agee=5)
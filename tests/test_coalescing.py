@@ -0,0 +1,180 @@
+import json
+import threading
+import time
+
+from flask import Flask, request
+from flask_arrest import RestBlueprint
+from flask_arrest.coalescing import SingleFlight
+from flask_arrest.resources import HandlerMixin
+
+import pytest
+
+
+class SlowHandler(HandlerMixin):
+    singular = 'thing'
+    plural = 'things'
+
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+
+    def _from_id(self, obj_id):
+        self.calls += 1
+        self.release.wait(5)
+        if obj_id == 'missing':
+            raise KeyError(obj_id)
+        return {'id': obj_id, 'owner': request.headers.get('Authorization'),
+                'host': request.host}
+
+
+@pytest.fixture
+def handler():
+    return SlowHandler()
+
+
+@pytest.fixture
+def app(handler):
+    app = Flask('coalescing_testapp')
+    app.testing = True
+
+    api = RestBlueprint('api', __name__)
+    api.mount_resource(handler, coalesce=True)
+    app.register_blueprint(api)
+
+    return app
+
+
+def run_concurrently(n, func, release):
+    results = [None] * n
+
+    def run(i):
+        results[i] = func(i)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+
+    # give all threads a chance to join the flight
+    time.sleep(0.2)
+    release.set()
+
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_single_flight_shares_result():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return 'result'
+
+    results = run_concurrently(5, lambda i: flight.do('key', work), release)
+
+    assert len(calls) == 1
+    assert all(r[0] == 'result' for r in results)
+    assert sorted(r[1] for r in results) == [False, True, True, True, True]
+
+
+def test_single_flight_shares_exceptions():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def work():
+        release.wait(5)
+        raise KeyError('x')
+
+    def call(i):
+        try:
+            flight.do('key', work)
+        except KeyError as e:
+            return e
+
+    results = run_concurrently(3, call, release)
+    assert all(isinstance(r, KeyError) for r in results)
+
+
+def test_single_flight_forgets_finished_calls():
+    flight = SingleFlight()
+
+    assert flight.do('key', lambda: 1) == (1, False)
+    assert flight.do('key', lambda: 2) == (2, False)
+
+
+def get(app, url, accept='application/json', **headers):
+    headers['Accept'] = accept
+    with app.test_client() as client:
+        return client.get(url, headers=headers)
+
+
+def test_concurrent_reads_coalesced(app, handler):
+    responses = run_concurrently(
+        5, lambda i: get(app, '/thing/1/'), handler.release
+    )
+
+    assert handler.calls == 1
+    assert all(r.status_code == 200 for r in responses)
+    assert len(set(r.data for r in responses)) == 1
+    assert len(set(id(r) for r in responses)) == 5
+
+
+def test_content_type_splits_flights(app, handler):
+    app.blueprints['api'].outgoing.add_mimetype('text/plain')
+
+    responses = run_concurrently(
+        4, lambda i: get(app, '/thing/1/', accept=(
+            'text/plain' if i % 2 else 'application/json'
+        )), handler.release
+    )
+
+    assert all(r.status_code == 200 for r in responses)
+    assert handler.calls == 2
+
+
+def test_coalesced_errors(app, handler):
+    responses = run_concurrently(
+        3, lambda i: get(app, '/thing/missing/'), handler.release
+    )
+
+    assert handler.calls == 1
+    assert all(r.status_code == 404 for r in responses)
+
+
+def test_host_splits_flights(app, handler):
+    hosts = ['a.example.com', 'b.example.com']
+    responses = run_concurrently(
+        4, lambda i: get(app, '/thing/1/', Host=hosts[i % 2]), handler.release
+    )
+
+    assert handler.calls == 2
+    for i, r in enumerate(responses):
+        assert json.loads(r.data.decode('utf8'))['host'] == hosts[i % 2]
+
+
+def get_as(app, i):
+    return get(app, '/thing/1/', Authorization='alice' if i % 2 else 'bob')
+
+
+def test_credentialed_requests_not_coalesced(app, handler):
+    responses = run_concurrently(4, lambda i: get_as(app, i), handler.release)
+
+    assert handler.calls == 4
+    for i, r in enumerate(responses):
+        assert json.loads(r.data.decode('utf8'))['owner'] == (
+            'alice' if i % 2 else 'bob'
+        )
+
+
+def test_credentialed_coalescing_opt_in(app, handler):
+    handler.coalesce_credentialed = True
+    responses = run_concurrently(6, lambda i: get_as(app, i), handler.release)
+
+    assert handler.calls == 2
+    for i, r in enumerate(responses):
+        assert json.loads(r.data.decode('utf8'))['owner'] == (
+            'alice' if i % 2 else 'bob'
+        )
@@ -0,0 +1,11 @@
+import subprocess
+import sys
+
+
+def test_no_heavy_imports():
+    code = ('import sys, flask_arrest; '
+            'print(",".join(m for m in ("jsonext", "arrow", "dateutil") '
+            'if m in sys.modules))')
+    out = subprocess.check_output([sys.executable, '-c', code])
+
+    assert out.strip() == b''
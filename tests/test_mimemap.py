@@ -46,3 +46,21 @@ def test_mimetypes_is_copy(m):
     ms.add('c')
 
     assert m.get_mimetypes() == set(['a', 'b'])
+
+
+def test_resolve_cached(m):
+    m.set_mimetypes(['a'])
+
+    assert m.resolve('foo') is m.resolve('foo')
+    assert m.resolve('foo') == frozenset(['a'])
+
+
+def test_resolve_invalidated(m):
+    m.set_mimetypes(['a'])
+    m.resolve('foo')
+
+    m.add_mimetype('b', 'foo')
+    assert m.resolve('foo') == frozenset(['a', 'b'])
+
+    m.set_mimetypes(['c'])
+    assert m.resolve('foo') == frozenset(['b', 'c'])
@@ -0,0 +1,217 @@
+import datetime
+
+from flask import Flask, request
+from flask_arrest import RestBlueprint
+from flask_arrest.helpers import serialize_response, deserialize_request
+from flask_arrest import msgpackext
+from flask_arrest.serializers import SerializerRegistry, RawJSON
+
+import pytest
+
+
+def pure_dumps(data, serializers=None):
+    return msgpackext.dumps(data, serializers, use_library=False)
+
+
+def pure_loads(data):
+    return msgpackext.loads(data, use_library=False)
+
+
+@pytest.mark.parametrize('value', [
+    None, True, False,
+    0, 1, 127, 128, 255, 256, 65535, 65536, 2 ** 32, 2 ** 64 - 1,
+    -1, -32, -33, -128, -129, -32768, -32769, -2 ** 31 - 1, -2 ** 63,
+    0.5, -1e300,
+    u'', u'abc', u'\xfc€' * 20, u'x' * 300, u'y' * 70000,
+    b'', b'\x00\xff', b'z' * 300,
+    [], [1, [2, [3]]], list(range(20)), list(range(70000)),
+    {}, {u'a': 1, u'b': [True, None]},
+    dict((u'k%d' % i, i) for i in range(20)),
+])
+def test_roundtrip(value):
+    assert pure_loads(pure_dumps(value)) == value
+
+
+def test_known_encodings():
+    assert pure_dumps(None) == b'\xc0'
+    assert pure_dumps(-1) == b'\xff'
+    assert pure_dumps(200) == b'\xcc\xc8'
+    assert pure_dumps(u'a') == b'\xa1a'
+    assert pure_dumps(b'a') == b'\xc4\x01a'
+    assert pure_dumps([1, 2]) == b'\x92\x01\x02'
+    assert pure_dumps({u'a': 1}) == b'\x81\xa1a\x01'
+
+
+def test_tuples_become_lists():
+    assert pure_loads(pure_dumps((1, (2,)))) == [1, [2]]
+
+
+def test_ext_type():
+    assert pure_loads(b'\xd4\x05\x01') == msgpackext.ExtType(5, b'\x01')
+
+
+@pytest.mark.parametrize('data', [
+    b'', b'\x92\x01', b'\xc1', b'\xa3ab', b'\x01\x02',
+    b'\x81\x80\x01', b'\x81\x91\x90\x01',
+])
+def test_malformed(data):
+    with pytest.raises(ValueError):
+        pure_loads(data)
+
+
+class PlusTwo(datetime.tzinfo):
+    def utcoffset(self, dt):
+        return datetime.timedelta(hours=2)
+
+    def dst(self, dt):
+        return None
+
+
+class Point(object):
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+def test_type_extensions():
+    registry = SerializerRegistry()
+    registry.register(Point, ['x', 'y'])
+
+    data = {
+        'naive': datetime.datetime(2014, 1, 2, 3, 4, 5),
+        'aware': datetime.datetime(2014, 1, 2, 3, 4, 5, tzinfo=PlusTwo()),
+        'date': datetime.date(2014, 1, 2),
+        'set': set([1]),
+        'gen': (i for i in range(2)),
+        'point': Point(1, 2),
+        'raw': RawJSON('{"a": [1]}'),
+        'other': object,
+    }
+
+    assert pure_loads(pure_dumps(data, registry)) == {
+        'naive': '2014-01-02T03:04:05+00:00',
+        'aware': '2014-01-02T01:04:05+00:00',
+        'date': '2014-01-02',
+        'set': [1],
+        'gen': [0, 1],
+        'point': {'x': 1, 'y': 2},
+        'raw': {'a': [1]},
+        'other': str(object),
+    }
+
+
+class Both(object):
+    def to_dict(self):
+        return {'as': 'dict'}
+
+    def __iter__(self):
+        return iter(['as', 'list'])
+
+
+def test_same_conversions_as_json():
+    import json
+    import jsonext
+
+    data = [Both(), datetime.datetime(2014, 1, 2, tzinfo=PlusTwo()),
+            set(['x'])]
+    assert pure_loads(pure_dumps(data)) == json.loads(jsonext.dumps(data))
+
+
+def test_library_compatibility():
+    msgpack = pytest.importorskip('msgpack')
+    data = {u'a': [1, -200, 2 ** 40, 0.25, u'x' * 40, b'\x00' * 300, None]}
+
+    assert msgpack.unpackb(pure_dumps(data), raw=False) == data
+    assert pure_loads(msgpack.packb(data, use_bin_type=True)) == data
+
+
+@pytest.fixture
+def app():
+    app = Flask('msgpack_testapp')
+    app.testing = True
+    api = RestBlueprint('api', __name__)
+    api.incoming.add_mimetype('application/msgpack')
+    api.outgoing.add_mimetype('application/msgpack')
+
+    @api.route('/echo/', methods=['POST'])
+    def echo():
+        return serialize_response({'got': deserialize_request()})
+
+    app.register_blueprint(api)
+    return app
+
+
+def test_render_and_parse(app):
+    client = app.test_client()
+    resp = client.post('/echo/', data=pure_dumps({'a': [1, 2]}), headers={
+        'Content-Type': 'application/msgpack',
+        'Accept': 'application/msgpack',
+    })
+
+    assert resp.status_code == 200
+    assert resp.content_type == 'application/msgpack'
+    assert pure_loads(resp.data) == {'got': {'a': [1, 2]}}
+
+
+def test_parse_json(app):
+    client = app.test_client()
+    resp = client.post('/echo/', data='{"a": 1}', headers={
+        'Content-Type': 'application/json',
+        'Accept': 'application/msgpack',
+    })
+
+    assert pure_loads(resp.data) == {'got': {'a': 1}}
+
+
+def test_malformed_body(app):
+    client = app.test_client()
+    resp = client.post('/echo/', data=b'\x92\x01', headers={
+        'Content-Type': 'application/msgpack',
+        'Accept': 'application/msgpack',
+    })
+
+    assert resp.status_code == 400
+    assert resp.content_type == 'application/msgpack'
+    problem = pure_loads(resp.data)
+    assert problem['status'] == 400
+    assert problem['title'] == 'Bad Request'
+
+
+def test_unhashable_key_body(app):
+    client = app.test_client()
+    resp = client.post('/echo/', data=b'\x81\x80\x01', headers={
+        'Content-Type': 'application/msgpack',
+        'Accept': 'application/msgpack',
+    })
+
+    assert resp.status_code == 400
+
+
+def test_unsupported_parser(app):
+    app.blueprints['api'].content_parser.content_funcs.pop(
+        'application/msgpack'
+    )
+    client = app.test_client()
+    resp = client.post('/echo/', data=b'\x80', headers={
+        'Content-Type': 'application/msgpack',
+        'Accept': 'application/msgpack',
+    })
+
+    assert resp.status_code == 415
+
+
+def test_not_accepted_by_default():
+    app = Flask('msgpack_testapp')
+    api = RestBlueprint('api', __name__)
+
+    @api.route('/legacy/', methods=['POST'])
+    def legacy():
+        return repr(request.get_json())
+
+    app.register_blueprint(api)
+    resp = app.test_client().post('/legacy/', data=b'\x80', headers={
+        'Content-Type': 'application/msgpack',
+        'Accept': 'application/json',
+    })
+
+    assert resp.status_code == 415
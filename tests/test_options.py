@@ -0,0 +1,139 @@
+from flask import Flask, request
+from flask_arrest import RestBlueprint
+from flask_arrest.resources import HandlerMixin
+
+import pytest
+
+
+class WidgetHandler(HandlerMixin):
+    singular = 'widget'
+    plural = 'widgets'
+
+    def _from_id(self, obj_id):
+        return {'id': obj_id}
+
+    def update(self, obj_id):
+        return {}
+
+    def create(self):
+        return {}
+
+    def query(self):
+        return []
+
+
+@pytest.fixture
+def app():
+    app = Flask('options_testapp')
+    app.testing = True
+    app.config['CORS_ALLOW_ORIGIN'] = '*'
+    app.config['CORS_MAX_AGE'] = 600
+    return app
+
+
+@pytest.fixture
+def api(app):
+    api = RestBlueprint('api', __name__)
+    api.incoming.add_mimetype('application/merge-patch+json', 'widget:update')
+    api.mount_resource(WidgetHandler())
+
+    @api.route('/plain/')
+    def plain():
+        raise AssertionError('view should not be entered')
+
+    @api.route('/custom/', methods=['GET', 'OPTIONS'])
+    def custom():
+        return 'custom %s' % request.method
+
+    app.register_blueprint(api, url_prefix='/api')
+    return api
+
+
+@pytest.fixture
+def client(app, api):
+    return app.test_client()
+
+
+def test_allow_collects_all_routes_of_path(client):
+    resp = client.open('/api/widget/1/', method='OPTIONS')
+
+    assert resp.status_code == 200
+    assert resp.headers['Allow'] == 'GET, HEAD, OPTIONS, PATCH'
+    assert resp.headers['Accept-Patch'] == \
+        'application/json, application/merge-patch+json'
+    assert 'Accept-Post' not in resp.headers
+
+
+def test_accept_post(client):
+    resp = client.open('/api/widgets/', method='OPTIONS')
+
+    assert resp.headers['Allow'] == 'GET, HEAD, OPTIONS, POST'
+    assert resp.headers['Accept-Post'] == 'application/json'
+
+
+def test_cors_preflight(client):
+    resp = client.open('/api/widgets/', method='OPTIONS', headers={
+        'Origin': 'http://example.com',
+        'Access-Control-Request-Method': 'POST',
+        'Content-Type': 'application/not-accepted',
+    })
+
+    assert resp.status_code == 200
+    assert resp.headers['Access-Control-Allow-Origin'] == '*'
+    assert resp.headers['Access-Control-Allow-Methods'] == \
+        'GET, HEAD, OPTIONS, POST'
+    assert 'Content-Type' in resp.headers['Access-Control-Allow-Headers']
+    assert resp.headers['Access-Control-Max-Age'] == '600'
+
+
+def test_view_not_entered(client):
+    assert client.open('/api/plain/', method='OPTIONS').status_code == 200
+
+
+def test_view_handling_options_entered(client):
+    resp = client.open('/api/custom/', method='OPTIONS')
+
+    assert resp.data == b'custom OPTIONS'
+
+
+def test_cors_on_responses(app, client):
+    resp = client.get('/api/widgets/', headers={'Accept': 'application/json',
+                                                'Origin': 'http://a.com'})
+
+    assert resp.status_code == 200
+    assert resp.headers['Access-Control-Allow-Origin'] == '*'
+    assert 'Vary' not in resp.headers
+
+    app.config['CORS_ALLOW_ORIGIN'] = 'http://a.com'
+    resp = client.get('/api/widgets/', headers={'Accept': 'application/json',
+                                                'Origin': 'http://a.com'})
+
+    assert resp.headers['Access-Control-Allow-Origin'] == 'http://a.com'
+    assert 'Origin' in resp.headers['Vary']
+
+    resp = client.open('/api/widgets/', method='OPTIONS')
+    assert resp.headers.getlist('Access-Control-Allow-Origin') == ['*']
+
+
+def test_no_cors_headers_unless_configured():
+    app = Flask('options_testapp')
+    api = RestBlueprint('api', __name__)
+    api.mount_resource(WidgetHandler())
+    app.register_blueprint(api)
+
+    resp = app.test_client().open('/widgets/', method='OPTIONS')
+
+    assert resp.headers['Allow']
+    assert 'Access-Control-Allow-Origin' not in resp.headers
+
+    resp = app.test_client().get('/widgets/',
+                                 headers={'Accept': 'application/json'})
+    assert 'Access-Control-Allow-Origin' not in resp.headers
+
+
+def test_warmup_recomputes(app, api, client):
+    api.incoming.add_mimetype('application/msgpack')
+    api.warmup(app)
+
+    resp = client.open('/api/widgets/', method='OPTIONS')
+    assert 'application/msgpack' in resp.headers['Accept-Post']
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+from flask_arrest.pretty import PrettyPrinter, iter_pformat, TRUNCATED
+from flask_arrest.serializers import SerializerRegistry
+
+
+def pformat(data, **kwargs):
+    return b''.join(iter_pformat(data, **kwargs)).decode('ascii')
+
+
+def test_scalars():
+    assert pformat(1) == '1\n'
+    assert pformat(None) == 'None\n'
+
+
+def test_nested():
+    assert pformat({'a': [1, (2,)], 'b': {}}) == (
+        "{\n"
+        "  'a': [\n"
+        "    1,\n"
+        "    (\n"
+        "      2\n"
+        "    )\n"
+        "  ],\n"
+        "  'b': {}\n"
+        "}\n"
+    )
+
+
+def test_generators_are_walked():
+    assert pformat(i for i in range(2)) == '[\n  0,\n  1\n]\n'
+
+
+def test_non_ascii_escaped():
+    assert pformat(u'\xe9') == repr(u'\xe9').encode(
+        'ascii', 'backslashreplace').decode('ascii') + '\n'
+
+
+def test_max_depth():
+    assert pformat([[[1]]], max_depth=1) == '[\n  [...]\n]\n'
+
+
+def test_max_items():
+    out = pformat(list(range(100)), max_items=2)
+
+    assert out == '[\n  0,\n  1,\n  %s\n]\n' % TRUNCATED
+
+
+def test_max_items_does_not_exhaust_generators():
+    consumed = []
+
+    def gen():
+        for i in range(1000):
+            consumed.append(i)
+            yield i
+
+    pformat(gen(), max_items=3)
+    assert len(consumed) == 4
+
+
+def test_max_bytes():
+    out = pformat(list(range(100000)), max_bytes=100)
+
+    assert len(out) <= 100 + len(TRUNCATED) + 2
+    assert out.endswith('\n%s\n' % TRUNCATED)
+
+
+def test_chunked_output():
+    chunks = list(PrettyPrinter(chunk_size=16).iter_chunks(list(range(100))))
+
+    assert len(chunks) > 1
+    assert b''.join(chunks) == b''.join(iter_pformat(list(range(100))))
+
+
+def test_serializers():
+    class Point(object):
+        def __init__(self):
+            self.x = 1
+
+    registry = SerializerRegistry()
+    registry.register(Point, ['x'])
+
+    assert pformat([Point()], serializers=registry) == \
+        "[\n  {\n    'x': 1\n  }\n]\n"
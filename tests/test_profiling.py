@@ -0,0 +1,153 @@
+import os
+import pstats
+import time
+
+from flask import Flask
+from flask_arrest import RestBlueprint
+from flask_arrest.profiling import profile_token, PROFILE_HEADER
+from flask_arrest.resources import HandlerMixin
+
+import pytest
+
+
+class ThingHandler(HandlerMixin):
+    singular = 'thing'
+    plural = 'things'
+
+    def _from_id(self, obj_id):
+        return {'id': obj_id}
+
+    def create(self):
+        return {}
+
+
+@pytest.fixture
+def app():
+    app = Flask('profiling_testapp')
+    app.testing = True
+    app.config['PROFILE_SECRET'] = 'sekrit'
+
+    api = RestBlueprint('api', __name__)
+    api.outgoing.add_mimetype('text/plain')
+    api.mount_resource(ThingHandler())
+    app.register_blueprint(api)
+
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def get(client, url, token=None):
+    headers = {'Accept': 'application/json'}
+    if token:
+        headers[PROFILE_HEADER] = token
+    return client.get(url, headers=headers)
+
+
+def test_not_profiled_without_token(client):
+    resp = get(client, '/thing/1/')
+
+    assert resp.status_code == 200
+    assert resp.content_type == 'application/json'
+
+
+def test_not_profiled_with_invalid_token(client):
+    resp = get(client, '/thing/1/', profile_token('wrong', 'GET', '/thing/1/'))
+
+    assert resp.content_type == 'application/json'
+
+
+@pytest.mark.parametrize('token', [
+    profile_token('sekrit', 'GET', '/thing/1/', time.time() - 600),
+    profile_token('sekrit', 'GET', '/thing/1/', time.time() + 600),
+    'garbage',
+    ':' + profile_token('sekrit', 'GET', '/thing/1/').split(':')[1],
+])
+def test_not_profiled_with_expired_token(client, token):
+    assert get(client, '/thing/1/', token).content_type == 'application/json'
+
+
+def test_token_max_age(app, client):
+    app.config['PROFILE_TOKEN_MAX_AGE'] = 1000
+    token = profile_token('sekrit', 'GET', '/thing/1/', time.time() - 600)
+
+    assert get(client, '/thing/1/', token).content_type.startswith(
+        'text/plain'
+    )
+
+
+def test_timestamp_signed(client):
+    token = profile_token('sekrit', 'GET', '/thing/1/', 1000)
+    forged = '%d:%s' % (time.time(), token.split(':')[1])
+
+    assert get(client, '/thing/1/', forged).content_type == 'application/json'
+
+
+def test_inline_report(client):
+    resp = get(client, '/thing/1/',
+               profile_token('sekrit', 'GET', '/thing/1/'))
+
+    assert resp.status_code == 200
+    assert resp.content_type.startswith('text/plain')
+    assert b'endpoint: api.thing\ntarget: show' in resp.data
+    assert b'cumulative' in resp.data
+
+
+def test_covers_content_type_checks(client):
+    resp = client.post('/things/', data='x', headers={
+        'Content-Type': 'application/unknown',
+        PROFILE_HEADER: profile_token('sekrit', 'POST', '/things/'),
+    })
+
+    assert resp.status_code == 415
+    assert b'target: create' in resp.data
+
+
+def test_profile_dir(app, client, tmpdir):
+    app.config['PROFILE_DIR'] = str(tmpdir)
+
+    resp = get(client, '/thing/1/',
+               profile_token('sekrit', 'GET', '/thing/1/'))
+
+    assert resp.content_type == 'application/json'
+    name = resp.headers['X-Profile-File']
+    assert name.startswith('api.thing-show-')
+    pstats.Stats(os.path.join(str(tmpdir), name))
+
+
+def test_covers_streamed_rendering(app, client, tmpdir):
+    token = profile_token('sekrit', 'GET', '/thing/1/')
+    headers = {'Accept': 'text/plain', PROFILE_HEADER: token}
+    app.config['PROFILE_LIMIT'] = None
+
+    resp = client.get('/thing/1/', headers=headers)
+    assert b'(_walk)' in resp.data
+
+    app.config['PROFILE_DIR'] = str(tmpdir)
+    resp = client.get('/thing/1/', headers=headers, buffered=True)
+
+    assert b"'id': '1'" in resp.data
+    stats = pstats.Stats(os.path.join(str(tmpdir),
+                                      resp.headers['X-Profile-File']))
+    assert '_walk' in [func[2] for func in stats.stats]
+
+
+def test_sample_rate(app, client, tmpdir):
+    app.config['PROFILE_SAMPLE_RATE'] = 1.0
+    app.config['PROFILE_DIR'] = str(tmpdir)
+
+    resp = get(client, '/thing/1/')
+    assert resp.content_type == 'application/json'
+    assert 'X-Profile-File' not in resp.headers
+    assert len(tmpdir.listdir()) == 1
+
+
+def test_sample_rate_without_dir(app, client):
+    app.config['PROFILE_SAMPLE_RATE'] = 1.0
+
+    resp = get(client, '/thing/1/')
+    assert resp.content_type == 'application/json'
+    assert resp.data == b'{"id": "1"}'
@@ -0,0 +1,78 @@
+import json
+
+from flask import Flask, request
+from flask_arrest import RestBlueprint
+from flask_arrest.helpers import serialize_response
+from flask_arrest.renderers import get_json_encoder
+from flask_arrest.serializers import RawJSON
+
+import pytest
+
+
+def dumps(data):
+    return json.dumps(data, cls=get_json_encoder())
+
+
+def test_raw_json_top_level():
+    assert dumps(RawJSON(b'{"a":  1}')) == '{"a":  1}'
+
+
+def test_raw_json_nested():
+    data = {'cached': RawJSON('{"x": [1, 2]}'),
+            'list': [RawJSON('null'), 'text']}
+
+    assert json.loads(dumps(data)) == {'cached': {'x': [1, 2]},
+                                       'list': [None, 'text']}
+    assert '{"x": [1, 2]}' in dumps(data)
+
+
+def test_raw_json_not_parsed():
+    # invalid JSON is passed through unchanged, proving it is never parsed
+    assert dumps([RawJSON('{oops')]) == '[{oops]'
+
+
+def test_placeholder_lookalikes_untouched():
+    assert json.loads(dumps(['\x00abc:0\x00', RawJSON('1')])) == \
+        ['\x00abc:0\x00', 1]
+
+
+@pytest.fixture
+def client():
+    app = Flask('renderer_testapp')
+    app.testing = True
+    api = RestBlueprint('api', __name__)
+    api.outgoing.add_mimetype('text/plain')
+
+    @api.route('/raw/')
+    def raw():
+        return serialize_response({'data': RawJSON('[1, 2, 3]')})
+
+    @api.route('/lazy/')
+    def lazy():
+        # walked while the body is streamed
+        return serialize_response({
+            'args': (request.args[name] for name in ['a', 'b'])
+        })
+
+    app.register_blueprint(api)
+    return app.test_client()
+
+
+def test_raw_json_rendered(client):
+    resp = client.get('/raw/', headers={'Accept': 'application/json'})
+
+    assert resp.data == b'{"data": [1, 2, 3]}'
+
+
+def test_raw_json_text_plain(client):
+    resp = client.get('/raw/', headers={'Accept': 'text/plain'})
+
+    assert b"'data': [1, 2, 3]" in resp.data
+
+
+def test_text_plain_generator_reads_request(client):
+    resp = client.get('/lazy/?a=1&b=2', headers={'Accept': 'text/plain'})
+
+    assert resp.status_code == 200
+    assert b"'1'" in resp.data
+    assert b"'2'" in resp.data
@@ -0,0 +1,557 @@
+import json
+import os
+import shutil
+
+from flask import Flask, request
+from werkzeug.exceptions import NotFound
+from flask_arrest import RestBlueprint
+from flask_arrest.resources import (HandlerMixin, ChangeFeedMixin,
+                                    AttachmentMixin)
+
+import pytest
+
+
+class Widget(object):
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+
+    def to_dict(self):
+        return {'id': self.id, 'name': self.name}
+
+
+class WidgetHandler(HandlerMixin):
+    singular = 'widget'
+    plural = 'widgets'
+
+    def __init__(self):
+        self.store = {'1': Widget('1', 'foo')}
+        self.loads = []
+
+    def _from_id(self, obj_id):
+        self.loads.append(obj_id)
+        return self.store[obj_id]
+
+    def query(self):
+        return list(self.store.values())
+
+    def create(self):
+        obj = Widget(str(len(self.store) + 1),
+                     json.loads(request.data.decode('utf8'))['name'])
+        self.store[obj.id] = obj
+        return obj
+
+    def update(self, obj_id):
+        obj = self.show(obj_id)
+        obj.name = json.loads(request.data.decode('utf8'))['name']
+        return obj
+
+
+@pytest.fixture
+def handler():
+    return WidgetHandler()
+
+
+@pytest.fixture
+def app(handler):
+    app = Flask('resource_testapp')
+    app.testing = True
+
+    api = RestBlueprint('api', __name__)
+    api.mount_resource(handler)
+    app.register_blueprint(api)
+
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def post_json(client, url, data, method='post', **headers):
+    headers.setdefault('Accept', 'application/json')
+    headers['Content-Type'] = 'application/json'
+    return getattr(client, method)(url, data=json.dumps(data),
+                                   headers=headers)
+
+
+def test_show(client):
+    resp = client.get('/widget/1/', headers={'Accept': 'application/json'})
+
+    assert resp.status_code == 200
+    assert json.loads(resp.data.decode('utf8')) == {'id': '1', 'name': 'foo'}
+
+
+def test_show_missing(client):
+    assert client.get('/widget/99/').status_code == 404
+
+
+def test_create_renders_body(client):
+    resp = post_json(client, '/widgets/', {'name': 'bar'})
+
+    assert resp.status_code == 200
+    assert json.loads(resp.data.decode('utf8'))['name'] == 'bar'
+    assert 'Preference-Applied' not in resp.headers
+
+
+def test_create_minimal(client):
+    resp = post_json(client, '/widgets/', {'name': 'bar'},
+                     Prefer='return=minimal')
+
+    assert resp.status_code == 201
+    assert not resp.data
+    assert resp.headers['Location'].endswith('/widget/2/')
+    assert resp.headers['Preference-Applied'] == 'return=minimal'
+
+
+def test_update_minimal(client, handler):
+    resp = post_json(client, '/widget/1/', {'name': 'baz'}, method='patch',
+                     Prefer='respond-async, return=minimal; foo=bar')
+
+    assert resp.status_code == 204
+    assert not resp.data
+    assert resp.headers['Location'].endswith('/widget/1/')
+    assert handler.store['1'].name == 'baz'
+
+
+def test_minimal_without_resource_object(client, handler):
+    handler.create = lambda: {'made': True}
+    resp = post_json(client, '/widgets/', {'name': 'bar'},
+                     Prefer='return=minimal')
+
+    assert resp.status_code == 201
+    assert 'Location' not in resp.headers
+    assert resp.headers['Preference-Applied'] == 'return=minimal'
+
+
+def test_minimal_obj_to_id_errors_propagate(client, handler):
+    def broken(obj):
+        raise AttributeError('bug')
+    handler._obj_to_id = broken
+
+    with pytest.raises(AttributeError):
+        post_json(client, '/widgets/', {'name': 'bar'},
+                  Prefer='return=minimal')
+
+
+def test_minimal_ignored_on_reads(client):
+    resp = client.get('/widget/1/', headers={'Prefer': 'return=minimal',
+                                             'Accept': 'application/json'})
+
+    assert resp.status_code == 200
+    assert resp.data
+
+
+class User(object):
+    def __init__(self, id):
+        self.id = id
+
+    def to_dict(self):
+        return {'id': self.id}
+
+
+class UserHandler(HandlerMixin):
+    singular = 'user'
+    plural = 'users'
+
+    def __init__(self):
+        self.batches = []
+
+    def _from_ids(self, ids):
+        self.batches.append(sorted(ids))
+        return dict((i, User(i)) for i in ids if i != 'ghost')
+
+
+class PostHandler(HandlerMixin):
+    singular = 'post'
+    plural = 'posts'
+    references = {'author': 'user', 'reviewers': 'user'}
+
+    posts = {
+        '1': {'id': '1', 'author': 'a', 'reviewers': ['b', 'c']},
+        '2': {'id': '2', 'author': 'b', 'reviewers': ['ghost']},
+        '3': {'id': '3', 'author': None, 'reviewers': []},
+    }
+
+    def _from_id(self, obj_id):
+        return self.posts[obj_id]
+
+    def query(self):
+        return [self.posts[k] for k in sorted(self.posts)]
+
+
+@pytest.fixture
+def users():
+    return UserHandler()
+
+
+@pytest.fixture
+def ref_client(users):
+    app = Flask('reference_testapp')
+    app.testing = True
+
+    api = RestBlueprint('api', __name__)
+    api.mount_resource(users)
+    api.mount_resource(PostHandler())
+    app.register_blueprint(api)
+
+    return app.test_client()
+
+
+def get_json(client, url):
+    resp = client.get(url, headers={'Accept': 'application/json'})
+    assert resp.status_code == 200
+    return json.loads(resp.data.decode('utf8'))
+
+
+def test_references_are_links(ref_client, users):
+    post = get_json(ref_client, '/post/1/')
+
+    assert post['author'] == 'http://localhost/user/a/'
+    assert post['reviewers'] == ['http://localhost/user/b/',
+                                 'http://localhost/user/c/']
+    assert not users.batches
+
+
+def test_embed_batches_loads(ref_client, users):
+    posts = get_json(ref_client, '/posts/?embed=author,reviewers')
+
+    assert posts[0]['author'] == {'id': 'a'}
+    assert posts[0]['reviewers'] == [{'id': 'b'}, {'id': 'c'}]
+    assert posts[1]['reviewers'] == [None]
+    assert posts[2]['author'] is None
+
+    # one batch for both fields, every distinct id loaded only once
+    assert users.batches == [['a', 'b', 'c', 'ghost']]
+
+
+def test_embed_single_field(ref_client, users):
+    post = get_json(ref_client, '/post/1/?embed=author')
+
+    assert post['author'] == {'id': 'a'}
+    assert post['reviewers'][0] == 'http://localhost/user/b/'
+    assert users.batches == [['a']]
+
+
+def test_identity_map(app, handler):
+    with app.test_request_context('/'):
+        assert handler.show('1') is handler.show('1')
+        assert handler.loader.load_many(['1', '1', '99']) == \
+            [handler.store['1'], handler.store['1'], None]
+
+    assert handler.loads == ['1', '99']
+
+
+def test_show_outside_request(handler):
+    assert handler.show('1') is handler.store['1']
+    with pytest.raises(NotFound):
+        handler.show('99')
+
+
+class NoteHandler(ChangeFeedMixin, HandlerMixin):
+    singular = 'note'
+    plural = 'notes'
+    changes_page_size = 2
+
+    log = [
+        ('1', 'created', 'a', {'text': 'first'}),
+        ('2', 'created', 'b', {'text': 'second'}),
+        ('3', 'updated', 'a', {'text': 'changed'}),
+        ('4', 'removed', 'b', None),
+    ]
+
+    def _changes_since(self, token):
+        if token is not None and token not in ('1', '2', '3', '4'):
+            raise ValueError(token)
+
+        for entry in self.log:
+            if token is None or int(entry[0]) > int(token):
+                yield entry
+
+
+@pytest.fixture
+def feed_client():
+    app = Flask('changes_testapp')
+    app.testing = True
+
+    api = RestBlueprint('api', __name__)
+    api.mount_resource(NoteHandler())
+    api.mount_resource(WidgetHandler())
+    app.register_blueprint(api)
+
+    return app.test_client()
+
+
+def test_changes_not_mounted_by_default(feed_client):
+    assert feed_client.get('/widgets/changes/').status_code == 404
+
+
+def test_changes_paginated(feed_client):
+    page = get_json(feed_client, '/notes/changes/')
+
+    assert [c['id'] for c in page['changes']] == ['a', 'b']
+    assert page['changes'][0] == {'op': 'created', 'id': 'a',
+                                  'resource': {'text': 'first'}}
+    assert page['token'] == '2'
+    assert page['more']
+
+    assert page['next'].startswith('http://localhost/notes/changes/?')
+    page = get_json(feed_client, page['next'][len('http://localhost'):])
+
+    assert page['changes'] == [
+        {'op': 'updated', 'id': 'a', 'resource': {'text': 'changed'}},
+        {'op': 'removed', 'id': 'b'},
+    ]
+    assert page['token'] == '4'
+    assert not page['more']
+    assert 'next' not in page
+
+
+def test_changes_up_to_date(feed_client):
+    page = get_json(feed_client, '/notes/changes/?since=4')
+
+    assert page == {'changes': [], 'token': '4', 'more': False}
+
+
+def test_changes_limit(feed_client):
+    page = get_json(feed_client, '/notes/changes/?since=1&limit=1')
+
+    assert len(page['changes']) == 1
+    assert page['token'] == '2'
+
+
+def test_changes_invalid_token(feed_client):
+    resp = feed_client.get('/notes/changes/?since=bogus',
+                           headers={'Accept': 'application/json'})
+
+    assert resp.status_code == 410
+
+
+class FileHandler(AttachmentMixin, HandlerMixin):
+    singular = 'file'
+    plural = 'files'
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.mimetypes = {}
+
+    def _from_id(self, obj_id):
+        return {'id': obj_id}
+
+    def _open_blob(self, obj_id):
+        path = os.path.join(self.directory, obj_id)
+        if not os.path.exists(path):
+            raise KeyError(obj_id)
+        self.opened = open(path, 'rb')
+        return self.opened, self.mimetypes.get(obj_id, 'text/plain')
+
+    def _store_blob(self, obj_id, fileobj, mimetype):
+        self.mimetypes[obj_id] = mimetype
+        with open(os.path.join(self.directory, obj_id), 'wb') as f:
+            shutil.copyfileobj(fileobj, f)
+
+
+@pytest.fixture
+def files(tmpdir):
+    tmpdir.join('hello').write('hello, world')
+    return FileHandler(str(tmpdir))
+
+
+@pytest.fixture
+def blob_client(files):
+    app = Flask('blob_testapp')
+    app.testing = True
+
+    api = RestBlueprint('api', __name__)
+    api.mount_resource(files)
+    api.mount_resource(WidgetHandler())
+    app.register_blueprint(api)
+
+    return app.test_client()
+
+
+def test_blob_not_mounted_by_default(blob_client):
+    assert blob_client.get('/widget/1/blob').status_code == 404
+
+
+def test_blob_download(blob_client):
+    resp = blob_client.get('/file/hello/blob')
+
+    assert resp.status_code == 200
+    assert resp.data == b'hello, world'
+    assert resp.content_type.startswith('text/plain')
+    assert resp.headers['Accept-Ranges'] == 'bytes'
+    assert resp.headers['ETag']
+
+
+def test_blob_range(blob_client):
+    resp = blob_client.get('/file/hello/blob', headers={'Range': 'bytes=7-'})
+
+    assert resp.status_code == 206
+    assert resp.data == b'world'
+    assert resp.headers['Content-Range'] == 'bytes 7-11/12'
+
+
+def test_blob_unsatisfiable_range_closes_file(blob_client, files):
+    resp = blob_client.get('/file/hello/blob',
+                           headers={'Range': 'bytes=100-'})
+
+    assert resp.status_code == 416
+    assert files.opened.closed
+
+
+def test_blob_conditional(blob_client):
+    etag = blob_client.get('/file/hello/blob').headers['ETag']
+    resp = blob_client.get('/file/hello/blob',
+                           headers={'If-None-Match': etag})
+
+    assert resp.status_code == 304
+
+
+def test_blob_missing(blob_client):
+    resp = blob_client.get('/file/nope/blob',
+                           headers={'Accept': 'application/json'})
+
+    assert resp.status_code == 404
+
+
+def test_blob_upload(blob_client, files, tmpdir):
+    payload = b'\x89PNG' + b'\x00' * 100000
+    resp = blob_client.put('/file/image/blob', data=payload,
+                           headers={'Content-Type': 'image/png'})
+
+    assert resp.status_code == 204
+    assert tmpdir.join('image').read('rb') == payload
+    assert files.mimetypes['image'] == 'image/png'
+
+    resp = blob_client.get('/file/image/blob')
+    assert resp.data == payload
+    assert resp.content_type == 'image/png'
+
+
+class DescribedWidgetHandler(WidgetHandler):
+    def _etag(self, target, obj_id=None):
+        if target == 'show':
+            return 'widget-%s' % self.store[obj_id].id
+
+    def _size(self, target, content_type, obj_id=None):
+        return 42
+
+    def _from_id(self, obj_id):
+        raise AssertionError('HEAD should not load objects')
+
+
+class TaggedWidgetHandler(WidgetHandler):
+    def _etag(self, target, obj_id=None):
+        if target == 'show':
+            return 'widget-%s' % self.store[obj_id].id
+
+
+class SizedWidgetHandler(WidgetHandler):
+    def _size(self, target, content_type, obj_id=None):
+        if target == 'show':
+            return 10
+
+
+def head_client(handler):
+    app = Flask('head_testapp')
+    app.testing = True
+    api = RestBlueprint('api', __name__)
+    api.mount_resource(handler)
+    app.register_blueprint(api)
+    return app.test_client()
+
+
+def test_head_counts_rendered_length(client):
+    get = client.get('/widget/1/', headers={'Accept': 'application/json'})
+    head = client.head('/widget/1/', headers={'Accept': 'application/json'})
+
+    assert head.status_code == 200
+    assert not head.data
+    assert head.headers['Content-Length'] == str(len(get.data))
+
+
+def test_head_streamed(app, client):
+    app.blueprints['api'].outgoing.add_mimetype('text/plain')
+
+    get = client.get('/widgets/', headers={'Accept': 'text/plain'})
+    head = client.head('/widgets/', headers={'Accept': 'text/plain'})
+
+    assert not head.data
+    assert head.headers['Content-Length'] == str(len(get.data))
+
+
+def test_head_hooks():
+    client = head_client(DescribedWidgetHandler())
+
+    resp = client.head('/widget/1/', headers={'Accept': 'application/json'})
+
+    assert resp.status_code == 200
+    assert resp.headers['ETag'] == '"widget-1"'
+    assert resp.headers['Content-Length'] == '42'
+    assert resp.content_type == 'application/json'
+
+    resp = client.head('/widget/1/', headers={'Accept': 'application/json',
+                                              'If-None-Match': '"widget-1"'})
+    assert resp.status_code == 304
+
+    resp = client.head('/widget/99/', headers={'Accept': 'application/json'})
+    assert resp.status_code == 404
+
+    # headers without a hook value are left out
+    client = head_client(TaggedWidgetHandler())
+    resp = client.head('/widget/1/', headers={'Accept': 'application/json'})
+
+    assert resp.status_code == 200
+    assert resp.headers['ETag'] == '"widget-1"'
+    assert 'Content-Length' not in resp.headers
+    assert 'Last-Modified' not in resp.headers
+
+
+def test_get_validators():
+    client = head_client(TaggedWidgetHandler())
+    client.application.blueprints['api'].outgoing.add_mimetype('text/plain')
+
+    for accept in ['application/json', 'text/plain']:
+        get = client.get('/widget/1/', headers={'Accept': accept})
+        head = client.head('/widget/1/', headers={'Accept': accept})
+
+        assert get.status_code == 200
+        assert get.headers['ETag'] == '"widget-1"'
+        assert head.headers['ETag'] == '"widget-1"'
+        assert head.content_type == get.content_type
+
+    for method in [client.get, client.head]:
+        resp = method('/widget/1/', headers={'Accept': 'application/json',
+                                             'If-None-Match': '"widget-1"'})
+        assert resp.status_code == 304
+        assert resp.headers['ETag'] == '"widget-1"'
+        assert not resp.data
+
+        resp = method('/widget/99/', headers={'Accept': 'application/json'})
+        assert resp.status_code == 404
+
+
+def test_head_size_hook_checks_existence():
+    handler = SizedWidgetHandler()
+    client = head_client(handler)
+
+    resp = client.head('/widget/99/', headers={'Accept': 'application/json'})
+    assert resp.status_code == 404
+
+    resp = client.head('/widget/1/', headers={'Accept': 'application/json'})
+    assert resp.status_code == 200
+    assert resp.headers['Content-Length'] == '10'
+
+
+def test_head_unsupported_target_rendered():
+    handler = SizedWidgetHandler()
+    handler.query = lambda: list(handler.store.values()) + ['queried']
+    client = head_client(handler)
+
+    get = client.get('/widgets/', headers={'Accept': 'application/json'})
+    head = client.head('/widgets/', headers={'Accept': 'application/json'})
+
+    assert b'queried' in get.data
+    assert head.headers['Content-Length'] == str(len(get.data))
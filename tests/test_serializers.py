@@ -0,0 +1,97 @@
+import json
+
+from flask import Flask
+from flask_arrest import RestBlueprint
+from flask_arrest.helpers import serialize_response
+from flask_arrest.serializers import SerializerRegistry
+
+import pytest
+
+
+class Point(object):
+    __slots__ = ('x', 'y', 'secret')
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.secret = 'hidden'
+
+
+class Person(object):
+    def __init__(self, name, location):
+        self.name = name
+        self.location = location
+
+
+@pytest.fixture
+def registry():
+    registry = SerializerRegistry()
+    registry.register(Point, ['x', 'y'])
+    registry.exports('name', 'location')(Person)
+    return registry
+
+
+@pytest.fixture
+def client(registry):
+    app = Flask('serializer_testapp')
+    app.testing = True
+    api = RestBlueprint('api', __name__)
+    api.serializers = registry
+    api.outgoing.add_mimetype('text/plain')
+
+    @api.route('/person/')
+    def person():
+        return serialize_response(Person('Alice', Point(1, 2)))
+
+    app.register_blueprint(api)
+    return app.test_client()
+
+
+def test_slots_class(registry):
+    assert registry.serialize(Point(1, 2)) == {'x': 1, 'y': 2}
+
+
+def test_unregistered_unchanged(registry):
+    obj = object()
+    assert registry.serialize(obj) is obj
+    assert registry.get_serializer(object) is None
+
+
+def test_subclass_uses_base_fields(registry):
+    class Point3D(Point):
+        __slots__ = ('z',)
+
+    assert registry.serialize(Point3D(3, 4)) == {'x': 3, 'y': 4}
+
+
+def test_serializer_is_cached(registry):
+    assert registry.get_serializer(Point) is registry.get_serializer(Point)
+
+
+def test_register_invalidates_cache(registry):
+    class Point3D(Point):
+        __slots__ = ('z',)
+
+    registry.get_serializer(Point3D)
+    registry.register(Point3D, ['z'])
+
+    p = Point3D(1, 2)
+    p.z = 3
+    assert registry.serialize(p) == {'z': 3}
+
+
+def test_json_renderer(client):
+    resp = client.get('/person/', headers={'Accept': 'application/json'})
+
+    assert resp.status_code == 200
+    assert json.loads(resp.data.decode('utf8')) == {
+        'name': 'Alice', 'location': {'x': 1, 'y': 2}
+    }
+
+
+def test_text_plain_renderer(client):
+    resp = client.get('/person/', headers={'Accept': 'text/plain'})
+
+    assert resp.status_code == 200
+    assert b"'x': 1" in resp.data
+    assert b'secret' not in resp.data
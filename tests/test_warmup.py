@@ -0,0 +1,81 @@
+from flask import Flask
+from flask_arrest import RestBlueprint
+from flask_arrest.resources import HandlerMixin
+
+import pytest
+
+
+class CountingHandler(HandlerMixin):
+    singular = 'thing'
+    plural = 'things'
+
+    def __init__(self):
+        self.lookups = []
+
+    def _from_id(self, obj_id):
+        self.lookups.append(obj_id)
+        raise KeyError(obj_id)
+
+
+@pytest.fixture
+def handler():
+    return CountingHandler()
+
+
+@pytest.fixture
+def app(handler):
+    app = Flask('warmup_testapp')
+    app.testing = True
+    return app
+
+
+@pytest.fixture
+def api(app, handler):
+    api = RestBlueprint('api', __name__)
+    api.outgoing.add_mimetype('text/plain')
+    api.mount_resource(handler)
+
+    @api.route('/other/')
+    def other():
+        return ''
+
+    app.register_blueprint(api)
+    return api
+
+
+def count_calls(renderer):
+    calls = []
+
+    def wrap(func):
+        def counting(data, content_type, status):
+            calls.append(content_type)
+            return func(data, content_type, status)
+        return counting
+
+    for content_type, func in list(renderer.content_funcs.items()):
+        renderer.register_renderer(content_type, wrap(func))
+    return calls
+
+
+def test_warmup(app, api, handler):
+    rendered = count_calls(api.content_renderer)
+    failed = count_calls(api.exception_renderer)
+
+    api.warmup(app)
+
+    # every outgoing type rendered once
+    assert sorted(rendered) == ['application/json', 'text/plain']
+
+    # dry request for every outgoing type
+    assert handler.lookups == [api.WARMUP_ID, api.WARMUP_ID]
+    assert sorted(failed) == ['application/json', 'text/plain']
+
+    # template compiled
+    assert len(api.absolute_jinja_env.cache)
+
+
+def test_warmup_without_routes(app):
+    api = RestBlueprint('empty', __name__)
+    app.register_blueprint(api)
+
+    api.warmup(app)